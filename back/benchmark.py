@@ -0,0 +1,204 @@
+"""
+백엔드 성능 벤치마크 스크립트.
+
+MONGODB_URL 의 임시 데이터베이스(BENCH_DB, 기본값 N-Nest-bench)를 사용하며
+pymongo 명령 모니터링으로 MongoDB 왕복 횟수를 셉니다.
+
+    python benchmark.py roster --rows 1000
+    python benchmark.py professors      # 실제 N-Nest 데이터를 읽기 전용으로 사용
+    python benchmark.py ledger --events 1000000 --students 5000
+    python benchmark.py normalize --evaluators 500 --teams 100   # DB 없이 CPU 시간만 측정
+    python benchmark.py assign --students 2000 --teams 400       # DB 없이 CPU 시간만 측정
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+import main
+
+
+class CommandCounter(monitoring.CommandListener):
+    """MongoDB로 전송된 명령(왕복) 수를 셉니다."""
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name not in ("hello", "isMaster", "ping", "endSessions"):
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+counter = CommandCounter()
+client = AsyncIOMotorClient(os.getenv("MONGODB_URL"), event_listeners=[counter])
+bench_db = client[os.getenv("BENCH_DB", "N-Nest-bench")]
+
+
+async def measure(label, coro_factory):
+    counter.count = 0
+    started = time.perf_counter()
+    await coro_factory()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<40} {counter.count:>6} round trips {elapsed * 1000:>10.1f} ms")
+
+
+async def legacy_save_students(students):
+    # 변경 전 구현: 학생마다 find_one + update_one
+    new_students = []
+    for student in students:
+        existing_student = await main.student_collection.find_one({"student_id": student.student_id})
+        if existing_student:
+            if student.course_code not in existing_student["course_codes"]:
+                await main.student_collection.update_one(
+                    {"student_id": student.student_id},
+                    {"$push": {"course_codes": student.course_code}}
+                )
+        else:
+            student_dict = student.dict()
+            student_dict["course_codes"] = [student_dict.pop("course_code")]
+            new_students.append(student_dict)
+    if new_students:
+        await main.student_collection.insert_many(new_students)
+
+
+async def bench_roster(rows: int):
+    main.student_collection = bench_db["Student"]
+    await main.student_collection.drop()
+    await main.student_collection.create_index("student_id")
+
+    first = [main.Student(name=f"학생{i}", student_id=f"S{i:06d}", department="CS", course_code="BENCH-1") for i in range(rows)]
+    second = [student.model_copy(update={"course_code": "BENCH-2"}) for student in first]
+    removal = [main.DeleteStudent(student_id=student.student_id, course_code="BENCH-2") for student in first]
+
+    await measure(f"legacy import ({rows} new rows)", lambda: legacy_save_students(first))
+    await main.student_collection.drop()
+    await main.student_collection.create_index("student_id")
+
+    await measure(f"bulk import ({rows} new rows)", lambda: main.save_students(first))
+    await measure(f"legacy import ({rows} updated rows)", lambda: legacy_save_students(second))
+    await main.student_collection.update_many({}, {"$pull": {"course_codes": "BENCH-2"}})
+    await measure(f"bulk import ({rows} updated rows)", lambda: main.save_students(second))
+    await measure(f"bulk removal ({rows} rows)", lambda: main.delete_students(removal))
+    await main.student_collection.drop()
+
+
+async def bench_professors():
+    source_db = client["N-Nest"]
+    main.professor_collection = source_db["Professor"]
+    main.course_collection = source_db["Course"]
+    main.availability_collection = source_db["availability"]
+
+    for impl in ("legacy", "aggregate"):
+        await measure(f"GET /api/professors ({impl})", lambda: main.get_professors(impl=impl))
+        await measure(f"GET /api/professors/available ({impl})", lambda: main.get_available_professors(impl=impl))
+
+
+async def bench_ledger(events: int, students: int):
+    main.score_ledger_collection = bench_db["ScoreLedger"]
+    main.scores_collection = bench_db["scores"]
+    await main.score_ledger_collection.drop()
+    await main.scores_collection.drop()
+    await main.score_ledger_collection.create_index([("studentId", 1), ("_id", 1)])
+
+    categories = list(main.titles)
+    rng = random.Random(0)
+    batch = []
+    for _ in range(events):
+        batch.append({
+            "studentId": f"S{rng.randrange(students):06d}",
+            "category": rng.choice(categories),
+            "points": rng.choice((1, -1, 0.5, -0.5))
+        })
+        if len(batch) == 10000:
+            await main.score_ledger_collection.insert_many(batch)
+            batch = []
+    if batch:
+        await main.score_ledger_collection.insert_many(batch)
+
+    await measure(f"rebuild scores ({events} events)", lambda: main.rebuild_scores_from_ledger())
+    await main.score_ledger_collection.drop()
+    await main.scores_collection.drop()
+
+
+def bench_normalize(evaluators: int, teams: int, reviews: int):
+    rng = random.Random(0)
+    criteria = ["기획", "구현", "발표", "협업"]
+    results = [
+        {
+            "team_name": f"team-{team}",
+            "evaluations": [
+                {"evaluator_id": f"S{evaluator:06d}", "scores": {criterion: rng.randint(1, 10) for criterion in criteria}}
+                for evaluator in rng.sample(range(evaluators), min(reviews, evaluators))
+            ]
+        }
+        for team in range(teams)
+    ]
+    started = time.perf_counter()
+    main.normalize_evaluation_scores(results)
+    elapsed = time.perf_counter() - started
+    print(f"normalize ({evaluators} evaluators, {teams} teams){'':<8} {elapsed * 1000:>10.1f} ms")
+
+
+def bench_assign(students: int, teams: int, reviews: int):
+    team_docs = [{"team_name": f"team-{team}", "students": []} for team in range(teams)]
+    for student in range(students):
+        team_docs[student % teams]["students"].append({"studentId": f"S{student:06d}", "name": f"학생{student}"})
+    started = time.perf_counter()
+    evaluations = main.assign_evaluations(team_docs, reviews, seed=0)
+    elapsed = time.perf_counter() - started
+
+    received = dict.fromkeys((team["team_name"] for team in team_docs), 0)
+    for assigned in evaluations.values():
+        for team_name in assigned:
+            received[team_name] += 1
+    print(f"assign ({students} students, {teams} teams){'':<10} {elapsed * 1000:>10.1f} ms"
+          f"  reviewers/team {min(received.values())}-{max(received.values())}")
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    roster = subparsers.add_parser("roster", help="/save-students/, /delete-students/ 왕복 횟수")
+    roster.add_argument("--rows", type=int, default=1000)
+
+    subparsers.add_parser("professors", help="교수 디렉터리 legacy/aggregate 비교")
+
+    ledger = subparsers.add_parser("ledger", help="ScoreLedger 재생으로 점수 재계산")
+    ledger.add_argument("--events", type=int, default=1000000)
+    ledger.add_argument("--students", type=int, default=5000)
+
+    normalize = subparsers.add_parser("normalize", help="평가자 편향 보정 계산 시간")
+    normalize.add_argument("--evaluators", type=int, default=500)
+    normalize.add_argument("--teams", type=int, default=100)
+    normalize.add_argument("--reviews", type=int, default=15, help="팀당 평가자 수")
+
+    assign = subparsers.add_parser("assign", help="평가 배정 계산 시간과 팀별 평가자 수 편차")
+    assign.add_argument("--students", type=int, default=2000)
+    assign.add_argument("--teams", type=int, default=400)
+    assign.add_argument("--reviews", type=int, default=3, help="학생당 평가할 팀 수")
+
+    args = parser.parse_args()
+    if args.command == "roster":
+        asyncio.run(bench_roster(args.rows))
+    elif args.command == "professors":
+        asyncio.run(bench_professors())
+    elif args.command == "ledger":
+        asyncio.run(bench_ledger(args.events, args.students))
+    elif args.command == "normalize":
+        bench_normalize(args.evaluators, args.teams, args.reviews)
+    elif args.command == "assign":
+        bench_assign(args.students, args.teams, args.reviews)
+
+
+if __name__ == "__main__":
+    run()
@@ -1,17 +1,33 @@
-from fastapi import FastAPI, HTTPException, Query, Request, Depends, APIRouter, Response, Cookie
+from fastapi import FastAPI, HTTPException, Query, Request, Depends, APIRouter, Response, Cookie, UploadFile, File, Form, BackgroundTasks
 from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, ReplaceOne, DeleteMany, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from fastapi.encoders import jsonable_encoder
-from pydantic import BaseModel, Field, HttpUrl, EmailStr
+from pydantic import BaseModel, Field, HttpUrl, EmailStr, ValidationError
 import httpx
 from dotenv import load_dotenv
 from collections import Counter, defaultdict
+from itertools import islice
+from bisect import bisect_right
+from openpyxl import load_workbook
+from cachetools import TTLCache
+from sortedcontainers import SortedList
 import asyncio
 import aiohttp
 import subprocess
 import os
+import sys
+import time
+import signal
+import ctypes
+import csv
+import codecs
+import base64
+import shutil
+import tempfile
 import jwt
 import asyncio
 from datetime import datetime, timedelta, timezone
@@ -19,8 +35,16 @@ from jose import jwt, JWTError
 from typing import Dict, Optional, List,Tuple, Union
 import random
 import json
+import warnings
+import numpy as np
+from scipy import stats
 from bson import ObjectId
 import logging
+try:
+    import pwd
+    import resource
+except ImportError:  # Windows에서는 로컬 채점기를 사용할 수 없음
+    pwd = resource = None
 from fastapi.security import OAuth2PasswordBearer
 import google.generativeai as genai
 from openai import OpenAI
@@ -52,7 +76,8 @@ app.add_middleware(
     allow_origins=["*"],  # 모든 오리진 허용
     allow_credentials=True,
     allow_methods=["*"],  # 모든 HTTP 메소드 허용
-    allow_headers=["*"]   # 모든 헤더 허용
+    allow_headers=["*"],  # 모든 헤더 허용
+    expose_headers=["X-Next-Cursor"]  # 페이지네이션 커서를 프론트엔드에서 읽을 수 있도록 노출
 )
 
 # 세션 미들웨어를 애플리케이션에 추가
@@ -82,6 +107,10 @@ evaluation_result_collection = db['EvaluationResult']
 professor_collection = db['Professor']
 availability_collection = db['availability']
 reservations_collection = db['reservations']
+reservation_slot_collection = db['reservation_slots']
+roster_import_collection = db['roster_imports']
+comment_collection = db['Comment']
+score_ledger_collection = db['ScoreLedger']
 # GitHub 설정
 CLIENT_ID = 'Iv1.636c6226a979a74a'
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
@@ -122,7 +151,7 @@ class ProjectInfo(BaseModel):
     image_preview_urls: List[str]
     generated_image_url: str
     views: int = Field(default=0)
-    comments: List[Comment] = []
+    comment_count: int = Field(default=0)  # 댓글은 Comment 콜렉션에 저장
     student_id: str
     course: str
     course_code: str
@@ -131,6 +160,13 @@ class Config:
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str}
 
+PROJECT_FIELDS = set(ProjectInfo.model_fields)
+# 프로젝트 카드에 필요한 필드 (text_extracted, image_preview_urls 등 큰 필드 제외)
+PROJECT_LIST_FIELDS = (
+    "username", "project_name", "description", "language", "stars", "updated_at",
+    "summary", "generated_image_url", "views", "comment_count", "student_id", "course", "course_code"
+)
+
 class Course(BaseModel):
     name: str
     professor: str
@@ -189,6 +225,116 @@ def object_id_to_str(document):
         document['_id'] = str(document['_id'])
     return document
 
+
+# 키셋 페이지네이션: _id 오름차순으로 정렬하고 마지막 _id를 불투명 커서로 전달
+def encode_cursor(document: dict, sort_field: Optional[str] = None) -> str:
+    if sort_field is None:
+        raw = document["_id"].binary
+    else:
+        raw = json.dumps([document.get(sort_field), str(document["_id"])]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort_field: Optional[str] = None):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        if sort_field is None:
+            return ObjectId(raw)
+        sort_value, last_id = json.loads(raw)
+        return sort_value, ObjectId(last_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def fetch_page(collection, response: Response, limit: int, cursor: Optional[str] = None,
+                     query: Optional[dict] = None, projection: Optional[dict] = None,
+                     sort_field: Optional[str] = None) -> List[dict]:
+    """
+    limit개의 문서를 반환하고, 다음 페이지가 있으면 X-Next-Cursor 헤더에 커서를 설정합니다.
+    기본은 _id 순서이며, sort_field를 주면 (sort_field, _id) 순서로 정렬합니다.
+    인덱스 범위 조회이므로 깊은 페이지도 첫 페이지와 비용이 같습니다.
+    """
+    query = dict(query or {})
+    if cursor and sort_field is None:
+        query["_id"] = {"$gt": decode_cursor(cursor)}
+    elif cursor:
+        sort_value, last_id = decode_cursor(cursor, sort_field)
+        # null은 {"$gt": null}로 비교되지 않으므로, null 다음 값은 "null이 아님"으로 찾음
+        after = {"$ne": None} if sort_value is None else {"$gt": sort_value}
+        query["$or"] = [{sort_field: after}, {sort_field: sort_value, "_id": {"$gt": last_id}}]
+    sort = [("_id", 1)] if sort_field is None else [(sort_field, 1), ("_id", 1)]
+    documents = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list(None)
+    if len(documents) > limit:
+        documents = documents[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(documents[-1], sort_field)
+    return documents
+
+
+def parse_fields(fields: Optional[str], allowed: set, default: Optional[Tuple[str, ...]] = None) -> Optional[dict]:
+    """
+    fields= 쿼리 파라미터(쉼표 구분)를 Mongo 프로젝션으로 변환합니다.
+    fields가 없으면 default를 사용하고, "*" 또는 default가 None이면 전체 문서를 반환합니다.
+    """
+    if fields is None:
+        selected = default
+    elif fields.strip() == "*":
+        selected = None
+    else:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = set(selected) - allowed
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    if selected is None:
+        return None
+    return {field: 1 for field in selected}
+
+
+class BatchLoader:
+    """
+    요청 단위 배치 로더 (DataLoader 방식).
+    같은 이벤트 루프 틱에서 요청된 키를 모아 한 번의 $in 쿼리로 조회합니다.
+    """
+    def __init__(self, collection, key: str, projection: Optional[dict] = None):
+        self.collection = collection
+        self.key = key
+        self.projection = projection
+        self._cache: Dict[str, asyncio.Future] = {}
+        self._pending: List[str] = []
+        self._dispatch_task: Optional[asyncio.Task] = None
+
+    def load(self, value: str) -> asyncio.Future:
+        if value in self._cache:
+            return self._cache[value]
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._cache[value] = future
+        self._pending.append(value)
+        if self._dispatch_task is None:
+            self._dispatch_task = loop.create_task(self._dispatch())
+        return future
+
+    async def load_many(self, values: List[str]) -> List[dict]:
+        # 입력 순서를 유지하고 존재하지 않는 키는 제외합니다.
+        documents = await asyncio.gather(*(self.load(value) for value in values))
+        return [document for document in documents if document]
+
+    async def _dispatch(self):
+        values, self._pending, self._dispatch_task = self._pending, [], None
+        try:
+            found = {}
+            async for document in self.collection.find({self.key: {"$in": values}}, self.projection):
+                found.setdefault(document[self.key], document)
+            for value in values:
+                self._cache[value].set_result(found.get(value))
+        except Exception as e:
+            for value in values:
+                future = self._cache.pop(value)
+                if not future.done():
+                    future.set_exception(e)
+
+
+def get_course_loader() -> BatchLoader:
+    """수업 코드 → Course 문서 로더 (요청마다 새로 생성)"""
+    return BatchLoader(course_collection, "code")
+
 @app.get("/courses/{course_code}", response_model=dict)
 async def get_course_with_students(course_code: str):
     course = await course_collection.find_one({"code": course_code})
@@ -233,19 +379,14 @@ class StudentCourses(BaseModel):
     courses: List[Course]
 
 @app.get("/api/user-courses/{student_id}", response_model=StudentCourses)
-async def get_user_courses(student_id: str):
+async def get_user_courses(student_id: str, course_loader: BatchLoader = Depends(get_course_loader)):
     # Student 콜렉션에서 학생 정보 조회
     student = await student_collection.find_one({"student_id": student_id})
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
     course_codes = student.get('course_codes', [])
-    courses = []
-
-    for code in course_codes:
-        course = await course_collection.find_one({"code": code})
-        if course:
-            courses.append(Course(**course))
+    courses = [Course(**course) for course in await course_loader.load_many(course_codes)]
 
     return StudentCourses(
         student_id=student['student_id'],
@@ -281,7 +422,7 @@ class UserQuery(BaseModel):
     githubUsername: str
 
 @app.post("/api/user-courses")
-async def get_user_courses(query: UserQuery):
+async def get_user_courses(query: UserQuery, course_loader: BatchLoader = Depends(get_course_loader)):
     try:
         # 1. User 콜렉션에서 studentId 조회
         user_data = await user_collection.find_one({"githubUsername": query.githubUsername})
@@ -297,11 +438,7 @@ async def get_user_courses(query: UserQuery):
 
             # 3. Course 콜렉션에서 수업 정보 조회
             course_codes = student_data.get("course_codes", [])
-            courses = []
-            for code in course_codes:
-                course_data = await course_collection.find_one({"code": code})
-                if course_data:
-                    courses.append(transform_id(course_data))
+            courses = [transform_id(course_data) for course_data in await course_loader.load_many(course_codes)]
 
             # 4. 반환할 데이터 구성
             result = {
@@ -385,37 +522,209 @@ async def get_courses():
         print(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def plan_student_writes(students: List[Student], existing: Dict[str, set]):
+    """
+    학생 목록을 student_id 단위 UpdateOne(upsert) 연산으로 묶습니다.
+    existing: 이미 저장된 student_id → 수강 코드 집합 (이 함수에서 갱신됨)
+    반환값: (연산 목록, 신규 학생 수, 갱신된 학생 수, 중복 학생 ID 목록)
+    """
+    new_students: Dict[str, dict] = {}
+    added_codes: Dict[str, List[str]] = defaultdict(list)
+    duplicate_students = []
+    updated_students = 0
+
+    for student in students:
+        course_codes = existing.get(student.student_id)
+        if course_codes is None:
+            new_students[student.student_id] = {"name": student.name, "student_id": student.student_id, "department": student.department}
+            existing[student.student_id] = {student.course_code}
+            added_codes[student.student_id].append(student.course_code)
+        elif student.course_code not in course_codes:
+            course_codes.add(student.course_code)
+            added_codes[student.student_id].append(student.course_code)
+            updated_students += 1
+        else:
+            duplicate_students.append(student.student_id)
+
+    operations = []
+    for student_id, codes in added_codes.items():
+        update = {"$addToSet": {"course_codes": {"$each": codes}}}
+        if student_id in new_students:
+            update["$setOnInsert"] = new_students[student_id]
+        operations.append(UpdateOne({"student_id": student_id}, update, upsert=True))
+    return operations, len(new_students), updated_students, duplicate_students
+
+async def write_student_batch(students: List[Student]) -> Tuple[int, int, List[str]]:
+    # 기존 학생을 한 번의 $in 쿼리로 조회하고 변경 사항은 하나의 bulk_write로 반영
+    student_ids = list({student.student_id for student in students})
+    existing = {}
+    async for doc in student_collection.find({"student_id": {"$in": student_ids}}, {"student_id": 1, "course_codes": 1}):
+        existing[doc["student_id"]] = set(doc.get("course_codes", []))
+
+    operations, new_count, updated_students, duplicate_students = plan_student_writes(students, existing)
+    if operations:
+        await student_collection.bulk_write(operations, ordered=False)
+    return new_count, updated_students, duplicate_students
+
 # 학생 추가 엔드포인트
 @app.post("/save-students/")
 async def save_students(students: List[Student]):
     try:
-        new_students = []
-        duplicate_students = []
-        updated_students = 0
+        new_count, updated_students, duplicate_students = await write_student_batch(students)
+        return {"message": f"{new_count} new students saved successfully, {updated_students} students updated with new course codes, {len(duplicate_students)} students already existed with the same course code and were not saved."}
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        for student in students:
-            existing_student = await student_collection.find_one({"student_id": student.student_id})
-            if existing_student:
-                if student.course_code not in existing_student["course_codes"]:
-                    await student_collection.update_one(
-                        {"student_id": student.student_id},
-                        {"$push": {"course_codes": student.course_code}}
-                    )
-                    updated_students += 1
-                else:
-                    duplicate_students.append(student.student_id)
-            else:
-                student_dict = student.dict()
-                student_dict["course_codes"] = [student_dict.pop("course_code")]
-                new_students.append(student_dict)
+# 명단 파일 업로드 설정
+ROSTER_IMPORT_BATCH_SIZE = 1000  # 한 번의 bulk_write로 반영할 행 수
+ROSTER_IMPORT_MAX_ERRORS = 1000  # 업로드 문서에 보관할 행 오류 최대 개수
+ROSTER_COLUMN_ALIASES = {
+    "이름": "name",
+    "학번": "student_id",
+    "학과": "department",
+    "수업코드": "course_code",
+    "수업 코드": "course_code"
+}
+
+def normalize_roster_header(header) -> List[Optional[str]]:
+    columns = []
+    for cell in header:
+        column = str(cell).strip().lower() if cell is not None else None
+        columns.append(ROSTER_COLUMN_ALIASES.get(column, column))
+    return columns
+
+def detect_csv_encoding(path: str) -> str:
+    # 파일 전체가 UTF-8로 읽히면 utf-8-sig, 아니면 학사 시스템/Excel 한글 내보내기의 기본값인 cp949
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with open(path, "rb") as f:
+        try:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                decoder.decode(chunk)
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError:
+            return "cp949"
+    return "utf-8-sig"
+
+def iter_roster_rows(path: str, encoding: Optional[str] = None):
+    """
+    명단 파일을 한 행씩 읽어 (행 번호, {열 이름: 값})을 반환합니다.
+    .xlsx는 openpyxl read-only 모드로 읽으므로 파일 전체를 메모리에 올리지 않습니다.
+    .csv는 encoding이 없으면 UTF-8/CP949 중에서 자동으로 판별합니다.
+    """
+    if path.endswith(".xlsx"):
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            columns = normalize_roster_header(next(rows, None) or [])
+            for row_number, row in enumerate(rows, start=2):
+                yield row_number, dict(zip(columns, row))
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline="", encoding=encoding or detect_csv_encoding(path)) as f:
+            rows = csv.reader(f)
+            columns = normalize_roster_header(next(rows, None) or [])
+            for row_number, row in enumerate(rows, start=2):
+                yield row_number, dict(zip(columns, row))
+
+def parse_roster_batch(batch, course_code: Optional[str]) -> Tuple[List[Student], List[dict]]:
+    students, errors = [], []
+    for row_number, row in batch:
+        values = {
+            field: str(row[field]).strip()
+            for field in Student.model_fields
+            if row.get(field) is not None and str(row[field]).strip()
+        }
+        if not values:
+            continue  # 빈 행
+        if course_code and "course_code" not in values:
+            values["course_code"] = course_code
+        try:
+            students.append(Student(**values))
+        except ValidationError as e:
+            message = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+            errors.append({"row": row_number, "error": message})
+    return students, errors
 
-        if new_students:
-            await student_collection.insert_many(new_students)
+async def run_roster_import(import_id: ObjectId, path: str, course_code: Optional[str], encoding: Optional[str] = None):
+    try:
+        rows = iter_roster_rows(path, encoding)
+        while True:
+            # 파일 읽기는 스레드에서 배치 단위로 수행하여 이벤트 루프를 막지 않음
+            batch = await asyncio.to_thread(list, islice(rows, ROSTER_IMPORT_BATCH_SIZE))
+            if not batch:
+                break
+
+            students, errors = parse_roster_batch(batch, course_code)
+            new_count, updated_students, duplicate_students = (0, 0, [])
+            if students:
+                new_count, updated_students, duplicate_students = await write_student_batch(students)
+
+            update = {
+                "$inc": {
+                    "processed_rows": len(batch),
+                    "new_students": new_count,
+                    "updated_students": updated_students,
+                    "duplicate_students": len(duplicate_students),
+                    "error_count": len(errors)
+                },
+                "$set": {"updated_at": datetime.now()}
+            }
+            if errors:
+                update["$push"] = {"errors": {"$each": errors, "$slice": ROSTER_IMPORT_MAX_ERRORS}}
+            await roster_import_collection.update_one({"_id": import_id}, update)
 
-        return {"message": f"{len(new_students)} new students saved successfully, {updated_students} students updated with new course codes, {len(duplicate_students)} students already existed with the same course code and were not saved."}
+        await roster_import_collection.update_one({"_id": import_id}, {"$set": {"status": "completed", "updated_at": datetime.now()}})
     except Exception as e:
-        print(f"Error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error("Roster import %s failed: %s", import_id, str(e))
+        await roster_import_collection.update_one({"_id": import_id}, {"$set": {"status": "failed", "detail": str(e), "updated_at": datetime.now()}})
+    finally:
+        os.remove(path)
+
+# 명단 파일(.xlsx, .csv) 업로드 엔드포인트
+@app.post("/upload-students/", status_code=202)
+async def upload_students(background_tasks: BackgroundTasks, file: UploadFile = File(...), course_code: Optional[str] = Form(None),
+                          encoding: Optional[str] = Form(None)):
+    suffix = os.path.splitext(file.filename or "")[1].lower()
+    if suffix not in (".xlsx", ".csv"):
+        raise HTTPException(status_code=400, detail="Only .xlsx and .csv files are supported.")
+    if encoding:
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            raise HTTPException(status_code=400, detail=f"Unknown encoding: {encoding}")
+
+    # 업로드 파일은 응답 후 닫히므로 임시 파일로 스트리밍 복사
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        await asyncio.to_thread(shutil.copyfileobj, file.file, tmp)
+
+    import_doc = {
+        "filename": file.filename,
+        "course_code": course_code,
+        "status": "processing",
+        "processed_rows": 0,
+        "new_students": 0,
+        "updated_students": 0,
+        "duplicate_students": 0,
+        "error_count": 0,
+        "errors": [],
+        "created_at": datetime.now(),
+        "updated_at": datetime.now()
+    }
+    result = await roster_import_collection.insert_one(import_doc)
+    background_tasks.add_task(run_roster_import, result.inserted_id, tmp.name, course_code, encoding)
+    return {"import_id": str(result.inserted_id), "status": "processing"}
+
+# 명단 업로드 진행 상황 및 행 오류 조회
+@app.get("/roster-imports/{import_id}")
+async def get_roster_import(import_id: str):
+    if not ObjectId.is_valid(import_id):
+        raise HTTPException(status_code=400, detail="Invalid import id")
+    import_doc = await roster_import_collection.find_one({"_id": ObjectId(import_id)})
+    if not import_doc:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return object_id_to_str(import_doc)
 
 # 수업 삭제 엔드포인트
 @app.post("/delete-courses/")
@@ -449,11 +758,16 @@ async def get_students(course_code: Optional[str] = Query(None)):
 @app.post("/delete-students/")
 async def delete_students(students: List[DeleteStudent]):
     try:
+        removed_codes: Dict[str, List[str]] = defaultdict(list)
         for student in students:
-            await student_collection.update_one(
-                {"student_id": student.student_id},
-                {"$pull": {"course_codes": student.course_code}}
-            )
+            removed_codes[student.student_id].append(student.course_code)
+
+        operations = [
+            UpdateOne({"student_id": student_id}, {"$pull": {"course_codes": {"$in": codes}}})
+            for student_id, codes in removed_codes.items()
+        ]
+        if operations:
+            await student_collection.bulk_write(operations, ordered=False)
         return {"message": f"{len(students)} students updated successfully."}
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -472,8 +786,10 @@ async def save_project(project_data: ProjectInfo):
         raise HTTPException(status_code=500, detail="Failed to save the document")
 
 @app.get("/api/projects")
-async def read_projects():
-    projects = await db["Project"].find().to_list(100)
+async def read_projects(response: Response, limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = Query(None, alias="next"),
+                        fields: Optional[str] = Query(None)):
+    projection = parse_fields(fields, PROJECT_FIELDS, PROJECT_LIST_FIELDS)
+    projects = await fetch_page(project_collection, response, limit, cursor, projection=projection)
     return [transform_id(project) for project in projects]
 
 
@@ -498,39 +814,168 @@ async def read_projects():
 #     except Exception as e:
 #         raise HTTPException(status_code=500, detail=str(e))
 
+def comment_helper(comment) -> dict:
+    return {
+        "id": str(comment["_id"]),
+        "username": comment["username"],
+        "content": comment["content"],
+        "timestamp": comment.get("timestamp")
+    }
+
 @app.post("/api/projects/{project_id}/comments")
 async def add_comment(project_id: str, comment: Comment):
     try:
-        project = await project_collection.find_one({"_id": ObjectId(project_id)})
-        if project is None:
+        # 댓글 수는 프로젝트 문서에 비정규화하여 저장
+        update_result = await project_collection.update_one(
+            {"_id": ObjectId(project_id)},
+            {"$inc": {"comment_count": 1}}
+        )
+        if update_result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Project not found")
 
         # 댓글에 타임스탬프 추가
-        comment.timestamp = datetime.datetime.now().isoformat()
+        comment.timestamp = datetime.now().isoformat()
         comment_dict = comment.dict()
+        comment_dict["project_id"] = ObjectId(project_id)
 
-        update_result = await project_collection.update_one(
-            {"_id": ObjectId(project_id)},
-            {"$push": {"comments": comment_dict}}
-        )
-
-        if update_result.modified_count == 1:
-            return JSONResponse(status_code=200, content={"message": "Comment added successfully"})
-        else:
-            raise HTTPException(status_code=500, detail="Failed to add comment")
+        try:
+            result = await comment_collection.insert_one(comment_dict)
+        except Exception:
+            # 댓글 저장에 실패하면 먼저 올린 댓글 수를 되돌림
+            await project_collection.update_one({"_id": ObjectId(project_id)}, {"$inc": {"comment_count": -1}})
+            raise
+        return JSONResponse(status_code=200, content={"message": "Comment added successfully", "id": str(result.inserted_id)})
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add comment: {str(e)}")
 
+@app.get("/api/projects/{project_id}/comments")
+async def get_comments(project_id: str, response: Response, limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = Query(None, alias="next")):
+    try:
+        comments = await fetch_page(comment_collection, response, limit, cursor,
+                                    query={"project_id": ObjectId(project_id)}, sort_field="timestamp")
+        return [comment_helper(comment) for comment in comments]
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch comments: {str(e)}")
+
+async def migrate_embedded_comments(batch_size: int = 500) -> int:
+    """
+    Project.comments 배열에 저장된 기존 댓글을 Comment 콜렉션으로 옮기는 일회성 마이그레이션.
+    batch_size개 댓글 단위로 bulk_write 하며, (project_id, legacy_index) 기준 upsert이므로 재실행해도 안전합니다.
+    """
+    migrated = 0
+    operations, project_ids = [], []
+
+    async def flush():
+        nonlocal operations, project_ids
+        if operations:
+            await comment_collection.bulk_write(operations, ordered=False)
+        if project_ids:
+            await project_collection.update_many({"_id": {"$in": project_ids}}, [
+                {"$set": {"comment_count": {"$add": [{"$ifNull": ["$comment_count", 0]}, {"$size": {"$ifNull": ["$comments", []]}}]}}},
+                {"$unset": "comments"}
+            ])
+        operations, project_ids = [], []
+
+    cursor = project_collection.find({"comments": {"$exists": True}}, {"comments": 1}, batch_size=batch_size)
+    async for project in cursor:
+        for index, comment in enumerate(project.get("comments") or []):
+            comment_doc = {
+                "project_id": project["_id"],
+                "username": comment.get("username"),
+                "content": comment.get("content"),
+                # 커서가 timestamp 순으로 넘기므로 null 대신 가장 앞에 정렬되는 ""를 사용
+                "timestamp": comment.get("timestamp") or ""
+            }
+            operations.append(UpdateOne(
+                {"project_id": project["_id"], "legacy_index": index},
+                {"$setOnInsert": comment_doc},
+                upsert=True
+            ))
+            migrated += 1
+        project_ids.append(project["_id"])
+        if len(operations) >= batch_size:
+            await flush()
+    await flush()
+    # 이전 실행에서 timestamp가 null로 옮겨진 댓글 보정
+    await comment_collection.update_many({"timestamp": None}, {"$set": {"timestamp": ""}})
+    return migrated
+
+
+class ViewCounter:
+    """
+    프로젝트 조회수 write-behind 누산기.
+    조회 시 update_one 대신 메모리에 증가분을 모아 flush_interval초마다 하나의 unordered bulk_write로 반영합니다.
+    버퍼는 max_pending개 프로젝트로 제한되며, 가득 차면 주기와 관계없이 즉시 flush합니다.
+    정상 종료(shutdown) 시에도 flush하므로, 유실 가능성은 프로세스가 비정상 종료된 경우
+    마지막 flush 이후 최대 flush_interval초 동안의 조회수(최대 max_pending개 프로젝트 분량)로 한정됩니다.
+    """
+    def __init__(self, collection, flush_interval: float = 5.0, max_pending: int = 10000):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Counter = Counter()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._overflow_task: Optional[asyncio.Task] = None
+
+    def increment(self, project_id: ObjectId):
+        self._pending[project_id] += 1
+        if len(self._pending) >= self.max_pending and (self._overflow_task is None or self._overflow_task.done()):
+            self._overflow_task = asyncio.get_running_loop().create_task(self.flush())
+
+    def pending(self, project_id: ObjectId) -> int:
+        return self._pending.get(project_id, 0)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, Counter()
+        operations = [UpdateOne({"_id": project_id}, {"$inc": {"views": count}}) for project_id, count in pending.items()]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # 실패한 연산의 증가분만 버퍼에 되돌려 다음 flush에서 재시도
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            self._pending.update({project_id: count for index, (project_id, count) in enumerate(pending.items()) if index in failed})
+            logger.error("View count flush partially failed: %s", str(e))
+        except Exception as e:
+            self._pending.update(pending)
+            logger.error("View count flush failed: %s", str(e))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        self._flush_task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+VIEW_FLUSH_INTERVAL = float(os.getenv("VIEW_FLUSH_INTERVAL", "5"))
+view_counter = ViewCounter(project_collection, flush_interval=VIEW_FLUSH_INTERVAL)
 
 @app.get("/api/projects/{project_id}")
-async def read_project(project_id: str):
+async def read_project(project_id: str, fields: Optional[str] = Query(None)):
     try:
-        project = await project_collection.find_one({"_id": ObjectId(project_id)})
+        projection = parse_fields(fields, PROJECT_FIELDS)
+        project = await project_collection.find_one({"_id": ObjectId(project_id)}, projection)
         if project is None:
             raise HTTPException(status_code=404, detail="Project not found")
-        # 조회수 증가
-        await project_collection.update_one({"_id": ObjectId(project_id)}, {"$inc": {"views": 1}})
+        # 조회수 증가 (write-behind, 아직 반영되지 않은 증가분도 응답에 포함)
+        view_counter.increment(project["_id"])
+        if "views" in project:
+            project["views"] += view_counter.pending(project["_id"])
         return transform_id(project)
+    except HTTPException as e:
+        raise e
     except Exception as e:
         print(f"Failed to fetch project: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch project: {str(e)}")
@@ -570,7 +1015,7 @@ async def get_user_name(query: UserQuery):
     return UserResponse(name=name, githubId=github_id, studentId=student_id)
 
 @app.post("/api/user-info")
-async def get_user_info(query: UserQuery):
+async def get_user_info(query: UserQuery, course_loader: BatchLoader = Depends(get_course_loader)):
     try:
         user_data = await db.User.find_one({"githubUsername": query.githubUsername})
         if user_data is None:
@@ -583,11 +1028,7 @@ async def get_user_info(query: UserQuery):
 
         # 수업 정보 조회
         course_codes = student_data.get("course_codes", [])
-        courses = []
-        for code in course_codes:
-            course_data = await db.Course.find_one({"code": code})
-            if course_data:
-                courses.append(course_data)
+        courses = await course_loader.load_many(course_codes)
 
         # 반환할 데이터 구성
         result = {
@@ -803,9 +1244,60 @@ async def get_user_status(request: Request):
 async def startup_db_client():
     app.mongodb_client = AsyncIOMotorClient(MONGODB_URL)
     app.mongodb = app.mongodb_client['N-Nest']
+    await ensure_indexes()
+    view_counter.start()
+    if LEADERBOARD_IN_MEMORY:
+        app.leaderboard_task = asyncio.create_task(leaderboard.load(scores_collection))
+    await availability_index.load(availability_collection)
+    judge_queue.start()
+
+async def ensure_indexes():
+    # 조회 경로에서 사용하는 인덱스 생성 (이미 있으면 무시됨)
+    await course_collection.create_index("code")
+    await course_collection.create_index("professor_id")
+    await professor_collection.create_index("professor_id")
+    await student_collection.create_index("student_id")
+    await student_collection.create_index("course_codes")
+    await comment_collection.create_index([("project_id", 1), ("timestamp", 1), ("_id", 1)])
+    try:
+        # update_scores의 upsert가 중복 문서를 만들지 않도록 학생당 하나의 점수 문서만 허용
+        await scores_collection.create_index("studentId", unique=True)
+    except Exception as e:
+        logger.warning("Could not create unique scores.studentId index: %s", str(e))
+    for category in titles:
+        await scores_collection.create_index([(f"scores.{category}", -1), ("studentId", 1)])
+    await scores_collection.create_index([("total_score", -1), ("studentId", 1)])
+    await score_ledger_collection.create_index([("studentId", 1), ("_id", 1)])
+    await submissions_collection.create_index([("status", 1), ("created_at", 1)])
+    try:
+        # 팀은 (course_code, team_name)당 하나의 문서 (register_student의 동시 팀 생성 방지)
+        await course_team_collection.create_index([("course_code", 1), ("team_name", 1)], unique=True)
+    except Exception as e:
+        logger.warning("Could not create unique Course_team (course_code, team_name) index: %s", str(e))
+    await reservations_collection.create_index([("userId", 1), ("date", 1), ("time", 1)])
+    try:
+        # reserve_slot의 초과 예약 방지가 이 고유 인덱스에 의존함
+        await reservation_slot_collection.create_index([("userId", 1), ("date", 1), ("time", 1)], unique=True)
+    except Exception as e:
+        logger.error("Could not create unique reservation_slots (userId, date, time) index: %s", str(e))
+    try:
+        # 평가 배정은 (course_code, studentId)당 하나의 문서
+        await evaluation_assignment_collection.create_index([("course_code", 1), ("studentId", 1)], unique=True)
+    except Exception as e:
+        logger.warning("Could not create unique evaluation_assignments (course_code, studentId) index: %s", str(e))
+    # 완료 현황 증분 모드: 변경된 팀 조회와 그 팀이 포함된 배정 조회
+    await evaluation_assignment_collection.create_index([("course_code", 1), ("teams", 1)])
+    await evaluation_result_collection.create_index([("course_code", 1), ("updated_at", 1)])
+    try:
+        # submit_evaluation의 중복 평가 방지가 이 고유 인덱스에 의존함
+        await evaluation_result_collection.create_index([("course_code", 1), ("team_name", 1)], unique=True)
+    except Exception as e:
+        logger.error("Could not create unique EvaluationResult (course_code, team_name) index: %s", str(e))
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await view_counter.stop()
+    await judge_queue.stop()
     app.mongodb_client.close()
 
 # 사용 예
@@ -938,34 +1430,34 @@ async def register_student(student_registration: StudentRegistration, update: Op
         "name": student_info["name"]
     }
 
-    team = await course_team_collection.find_one({"course_code": student_registration.course_code})
-    if not team:
-        team_data = {
-            "course_code": student_registration.course_code,
-            "teams": []
-        }
-        await course_team_collection.insert_one(team_data)
-        team = await course_team_collection.find_one({"course_code": student_registration.course_code})
-
-    # 학생이 이미 다른 팀에 속해 있는지 확인하고 제거
-    for team_item in team["teams"]:
-        if any(s["studentId"] == student_info["studentId"] for s in team_item["students"]):
-            team_item["students"] = [s for s in team_item["students"] if s["studentId"] != student_info["studentId"]]
-
-    # 팀에 학생 추가 또는 팀 생성
-    existing_team = next((t for t in team["teams"] if t["team_name"] == student_registration.team_name), None)
-    if existing_team:
-        existing_team["students"].append(student_data)
-    else:
-        if len(team["teams"]) >= max_teams:
-            raise HTTPException(status_code=400, detail="Maximum number of teams reached for this course")
-        new_team = {
-            "team_name": student_registration.team_name,
-            "students": [student_data]
-        }
-        team["teams"].append(new_team)
+    course_code = student_registration.course_code
+    team_name = student_registration.team_name
+    team_filter = {"course_code": course_code, "team_name": team_name}
 
-    await course_team_collection.update_one({"_id": team["_id"]}, {"$set": {"teams": team["teams"]}})
+    # 기존 팀이면 바로 추가, 새 팀이면 팀 수 카운터로 자리를 먼저 확보한 뒤 생성
+    result = await course_team_collection.update_one(team_filter, {"$addToSet": {"students": student_data}})
+    if result.matched_count == 0:
+        reserved = await evaluation_collection.find_one_and_update(
+            {"course_code": course_code, "$expr": {"$lt": [{"$ifNull": ["$team_count", 0]}, max_teams]}},
+            {"$inc": {"team_count": 1}}
+        )
+        if not reserved:
+            raise HTTPException(status_code=400, detail="Maximum number of teams reached for this course")
+        try:
+            result = await course_team_collection.update_one(team_filter, {"$addToSet": {"students": student_data}}, upsert=True)
+            created = result.upserted_id is not None
+        except DuplicateKeyError:
+            # 동시에 같은 팀이 생성됨: 생성된 팀에 추가
+            await course_team_collection.update_one(team_filter, {"$addToSet": {"students": student_data}})
+            created = False
+        if not created:
+            await evaluation_collection.update_one({"course_code": course_code}, {"$inc": {"team_count": -1}})
+
+    # 학생이 다른 팀에 속해 있었다면 제거
+    await course_team_collection.update_many(
+        {"course_code": course_code, "team_name": {"$ne": team_name}, "students.studentId": student_info["studentId"]},
+        {"$pull": {"students": {"studentId": student_info["studentId"]}}}
+    )
     return {"message": "Student registered successfully"}
 
 
@@ -983,15 +1475,13 @@ async def get_student_by_github(githubId: str):
 # 평가 할당 조회 API
 @app.get("/api/evaluation-assignments/{course_code}/{studentId}")
 async def get_evaluation_assignments(course_code: str, studentId: str):
-    assignments = await evaluation_assignment_collection.find_one({"course_code": course_code})
-    if not assignments:
-        raise HTTPException(status_code=404, detail="Evaluation assignments not found")
-
-    student_evaluations = assignments.get("evaluations", {}).get(studentId)
-    if not student_evaluations:
+    assignment = await evaluation_assignment_collection.find_one(
+        {"course_code": course_code, "studentId": studentId}, {"_id": 0, "teams": 1}
+    )
+    if not assignment or not assignment.get("teams"):
         raise HTTPException(status_code=404, detail="Evaluations not found for the student")
 
-    return {"evaluations": student_evaluations}
+    return {"evaluations": assignment["teams"]}
 
 # 평가 기준 조회 API
 @app.get("/api/evaluations/{course_code}")
@@ -1003,91 +1493,420 @@ async def get_evaluation_criteria(course_code: str):
 
 @app.post("/api/evaluate")
 async def submit_evaluation(evaluation: Evaluation):
-    existing_evaluation = await evaluation_result_collection.find_one(
-        {"course_code": evaluation.course_code, "team_name": evaluation.team_name, "evaluations.evaluator_id": evaluation.evaluator_id}
-    )
-
-    if existing_evaluation:
-        raise HTTPException(status_code=400, detail="You have already submitted an evaluation for this team.")
+    if any("." in criteria or criteria.startswith("$") for criteria in evaluation.scores):
+        raise HTTPException(status_code=400, detail="Criteria names cannot contain '.' or start with '$'.")
 
     evaluation_result = {
         "evaluator_id": evaluation.evaluator_id,  # GitHub 아이디 대신 학번을 저장
         "scores": evaluation.scores
     }
 
-    await evaluation_result_collection.update_one(
-        {"course_code": evaluation.course_code, "team_name": evaluation.team_name},
-        {"$push": {"evaluations": evaluation_result}},
-        upsert=True
-    )
+    # 평가 추가와 기준별 누적 합계 갱신을 하나의 upsert로 처리
+    # 이미 평가한 경우 필터가 일치하지 않아 새 문서를 만들려 하고, (course_code, team_name) 고유 인덱스로 거부됨
+    increments = {f"totals.{criteria}": score for criteria, score in evaluation.scores.items()}
+    increments["total_score"] = sum(evaluation.scores.values())
+    increments["evaluator_count"] = 1
+    try:
+        await evaluation_result_collection.update_one(
+            {"course_code": evaluation.course_code, "team_name": evaluation.team_name, "evaluations.evaluator_id": {"$ne": evaluation.evaluator_id}},
+            {"$push": {"evaluations": evaluation_result}, "$inc": increments, "$set": {"updated_at": datetime.now()}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="You have already submitted an evaluation for this team.")
+    evaluation_totals_cache.pop(evaluation.course_code, None)
     return {"message": "Evaluation submitted successfully"}
 
 
 
+# 수업별 팀 평가 합계 캐시 (submit_evaluation에서 무효화)
+evaluation_totals_cache = TTLCache(maxsize=1000, ttl=300)
+
+def evaluation_totals_pipeline(course_code: str) -> List[dict]:
+    return [
+        {"$match": {"course_code": course_code}},
+        {"$set": {"evaluator_count": {"$size": {"$ifNull": ["$evaluations", []]}}}},
+        {"$unwind": {"path": "$evaluations", "preserveNullAndEmptyArrays": True}},
+        {"$project": {"team_name": 1, "evaluator_count": 1, "scores": {"$objectToArray": {"$ifNull": ["$evaluations.scores", {}]}}}},
+        {"$unwind": {"path": "$scores", "preserveNullAndEmptyArrays": True}},
+        {"$group": {
+            "_id": {"team_name": "$team_name", "criteria": "$scores.k"},
+            "total": {"$sum": "$scores.v"},
+            "evaluator_count": {"$first": "$evaluator_count"}
+        }},
+        {"$group": {
+            "_id": "$_id.team_name",
+            "total_scores": {"$push": {"k": "$_id.criteria", "v": "$total"}},
+            "total_score": {"$sum": "$total"},
+            "evaluator_count": {"$first": "$evaluator_count"}
+        }},
+        {"$project": {
+            "_id": 0,
+            "team_name": "$_id",
+            "evaluator_count": 1,
+            # 평가가 없는 팀은 기준 없이 합계 0으로 남김
+            "total_scores": {"$arrayToObject": {"$filter": {"input": "$total_scores", "cond": {"$ne": [{"$type": "$$this.k"}, "missing"]}}}},
+            "total_score": 1
+        }},
+        {"$sort": {"team_name": 1}}
+    ]
+
+async def get_evaluation_totals(course_code: str) -> List[dict]:
+    """submit_evaluation에서 누적한 팀별 기준별 합계와 총점을 읽습니다 (평가 수와 무관하게 팀 수만큼만 읽음)."""
+    totals = evaluation_totals_cache.get(course_code)
+    if totals is None:
+        cursor = evaluation_result_collection.find({"course_code": course_code}, {"team_name": 1, "totals": 1, "total_score": 1})
+        totals = [
+            {"team_name": result["team_name"], "total_scores": result.get("totals", {}), "total_score": result.get("total_score", 0)}
+            async for result in cursor.sort("team_name", 1)
+        ]
+        evaluation_totals_cache[course_code] = totals
+    return totals
+
+async def check_evaluation_totals(course_code: str, repair: bool = False) -> List[dict]:
+    """
+    원본 평가(evaluations)로부터 다시 계산한 합계와 누적 합계(totals, total_score, evaluator_count)를 비교해 차이를 보고합니다.
+    repair=True이면 다시 계산한 값으로 누적 합계를 덮어씁니다.
+    """
+    expected = await evaluation_result_collection.aggregate(evaluation_totals_pipeline(course_code)).to_list(None)
+    stored = {}
+    async for result in evaluation_result_collection.find({"course_code": course_code}, {"team_name": 1, "totals": 1, "total_score": 1, "evaluator_count": 1}):
+        stored[result["team_name"]] = result
+
+    drift = []
+    operations = []
+    for team in expected:
+        current = stored.get(team["team_name"], {})
+        actual = {
+            "total_scores": current.get("totals", {}),
+            "total_score": current.get("total_score", 0),
+            "evaluator_count": current.get("evaluator_count", 0)
+        }
+        recomputed = {key: team[key] for key in ("total_scores", "total_score", "evaluator_count")}
+        if actual != recomputed:
+            drift.append({"team_name": team["team_name"], "stored": actual, "recomputed": recomputed})
+            operations.append(UpdateOne(
+                {"course_code": course_code, "team_name": team["team_name"]},
+                {"$set": {"totals": team["total_scores"], "total_score": team["total_score"], "evaluator_count": team["evaluator_count"]}}
+            ))
+
+    if repair and operations:
+        await evaluation_result_collection.bulk_write(operations, ordered=False)
+        evaluation_totals_cache.pop(course_code, None)
+    return drift
+
 @app.get("/api/evaluation-results/{course_code}")
 async def get_evaluation_results(course_code: str):
-    results = []
-    async for result in evaluation_result_collection.find({"course_code": course_code}):
-        total_scores = {}
-        for evaluation in result["evaluations"]:
-            for criteria, score in evaluation["scores"].items():
-                if criteria not in total_scores:
-                    total_scores[criteria] = 0
-                total_scores[criteria] += score
-
-        total_score = sum(total_scores.values())
-        results.append({
-            "team_name": result["team_name"],
-            "total_score": total_score
-        })
-    return results
+    totals = await get_evaluation_totals(course_code)
+    return [{"team_name": total["team_name"], "total_score": total["total_score"]} for total in totals]
 
 @app.get("/api/evaluation-progress/{course_code}")
 async def get_evaluation_progress(course_code: str):
-    progress = []
-    async for result in evaluation_result_collection.find({"course_code": course_code}):
-        total_scores = {}
-        for evaluation in result["evaluations"]:
-            for criteria, score in evaluation["scores"].items():
-                if criteria not in total_scores:
-                    total_scores[criteria] = 0
-                total_scores[criteria] += score
-
-        progress.append({
-            "team_name": result["team_name"],
-            "total_scores": total_scores,
-            "total_score": sum(total_scores.values())
+    return await get_evaluation_totals(course_code)
+
+def build_score_tensor(results: List[dict]) -> Tuple[np.ndarray, List[str], List[str]]:
+    """EvaluationResult 문서들을 평가자 × 팀 × 기준 점수 텐서로 변환합니다 (평가하지 않은 칸은 NaN)."""
+    evaluators, teams, criteria = {}, {}, {}
+    evaluator_index, team_index, criteria_index, values = [], [], [], []
+    for result in results:
+        team = teams.setdefault(result["team_name"], len(teams))
+        for evaluation in result.get("evaluations") or []:
+            evaluator = evaluators.setdefault(evaluation["evaluator_id"], len(evaluators))
+            for criterion, score in evaluation["scores"].items():
+                evaluator_index.append(evaluator)
+                team_index.append(team)
+                criteria_index.append(criteria.setdefault(criterion, len(criteria)))
+                values.append(score)
+
+    tensor = np.full((len(evaluators), len(teams), len(criteria)), np.nan)
+    tensor[evaluator_index, team_index, criteria_index] = values
+    return tensor, list(teams), list(criteria)
+
+def finite_or_none(value) -> Optional[float]:
+    return float(value) if np.isfinite(value) else None
+
+def normalize_evaluation_scores(results: List[dict], trim: float = 0.1, confidence: float = 0.95) -> List[dict]:
+    """
+    평가자별 편향을 보정한 팀 점수를 벡터 연산으로 계산합니다.
+    - z_mean: 평가자별로 (점수 - 평균) / 표준편차로 정규화한 뒤 팀·기준별 평균
+    - trimmed_mean: 팀·기준별 원점수에서 위아래 trim 비율을 잘라낸 평균
+    - ci_low, ci_high: z_mean의 t-분포 신뢰구간
+    """
+    tensor, teams, criteria = build_score_tensor(results)
+    if tensor.shape[0] == 0 or tensor.shape[2] == 0:
+        return [{"team_name": team, "evaluator_count": 0, "normalized_score": None, "criteria": {}} for team in teams]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)  # 빈 칸(NaN)만 있는 평균/표준편차
+
+        # 평가자별 z-score (평가자 축을 제외한 모든 점수 기준)
+        evaluator_mean = np.nanmean(tensor, axis=(1, 2), keepdims=True)
+        evaluator_std = np.nanstd(tensor, axis=(1, 2), keepdims=True)
+        z = np.divide(tensor - evaluator_mean, evaluator_std, out=np.zeros_like(tensor), where=evaluator_std > 0)
+        z[np.isnan(tensor)] = np.nan
+
+        counts = np.sum(~np.isnan(tensor), axis=0)  # 팀 × 기준
+        raw_mean = np.nanmean(tensor, axis=0)
+        z_mean = np.nanmean(z, axis=0)
+        z_std = np.nanstd(z, axis=0, ddof=1)
+        margin = stats.t.ppf((1 + confidence) / 2, np.maximum(counts - 1, 1)) * z_std / np.sqrt(counts)
+
+        # 절사평균: NaN은 정렬 시 뒤로 가므로 순위가 [k, n-k) 인 값만 남김
+        sorted_scores = np.sort(tensor, axis=0)
+        cut = np.floor(counts * trim).astype(int)
+        rank = np.arange(tensor.shape[0])[:, None, None]
+        keep = (rank >= cut) & (rank < counts - cut)
+        kept = keep.sum(axis=0)
+        trimmed_mean = np.where(kept > 0, np.where(keep, sorted_scores, 0).sum(axis=0) / np.maximum(kept, 1), np.nan)
+
+        team_score = np.nanmean(z_mean, axis=1)
+        team_evaluators = np.sum(np.any(~np.isnan(tensor), axis=2), axis=0)
+
+    normalized = []
+    for t, team in enumerate(teams):
+        normalized.append({
+            "team_name": team,
+            "evaluator_count": int(team_evaluators[t]),
+            "normalized_score": finite_or_none(team_score[t]),
+            "criteria": {
+                criterion: {
+                    "count": int(counts[t, c]),
+                    "raw_mean": finite_or_none(raw_mean[t, c]),
+                    "trimmed_mean": finite_or_none(trimmed_mean[t, c]),
+                    "z_mean": finite_or_none(z_mean[t, c]),
+                    "ci_low": finite_or_none(z_mean[t, c] - margin[t, c]),
+                    "ci_high": finite_or_none(z_mean[t, c] + margin[t, c])
+                }
+                for c, criterion in enumerate(criteria)
+            }
         })
-    return progress
-
+    normalized.sort(key=lambda team: (team["normalized_score"] is None, -(team["normalized_score"] or 0)))
+    return normalized
+
+# 평가자 편향 보정 결과 조회 API
+@app.get("/api/evaluation-results/{course_code}/normalized")
+async def get_normalized_evaluation_results(course_code: str, trim: float = Query(0.1, ge=0, lt=0.5),
+                                            confidence: float = Query(0.95, gt=0, lt=1)):
+    results = await evaluation_result_collection.find({"course_code": course_code}, {"team_name": 1, "evaluations": 1}).to_list(None)
+    if not results:
+        raise HTTPException(status_code=404, detail="No evaluation results found for the course")
+    return normalize_evaluation_scores(results, trim, confidence)
+
+# 누적 합계 정합성 검사 API (조회만 함)
+@app.get("/api/evaluation-results/{course_code}/consistency")
+async def get_evaluation_consistency(course_code: str):
+    drift = await check_evaluation_totals(course_code)
+    return {"course_code": course_code, "consistent": not drift, "drift": drift}
+
+# 누적 합계 복구 API (원본 평가 기준으로 다시 계산해 덮어씀)
+@app.post("/api/evaluation-results/{course_code}/consistency/repair")
+async def repair_evaluation_consistency(course_code: str):
+    drift = await check_evaluation_totals(course_code, repair=True)
+    return {"course_code": course_code, "repaired": bool(drift), "drift": drift}
+
+
+def assign_evaluations(teams: List[dict], reviews_per_student: int = 3, seed: int = 0) -> Dict[str, List[str]]:
+    """
+    학생마다 자기 팀을 제외한 reviews_per_student개 팀을 배정합니다.
+    현재 배정 수가 가장 적은 팀부터 고르는 탐욕 방식이라 팀별 평가자 수 차이가 최소화되며,
+    배정 수별 버킷(삽입 순서 dict)을 사용하므로 전체 O(학생 수 × 배정 수)입니다. 같은 seed면 같은 결과를 냅니다.
+    """
+    rng = random.Random(seed)
+    student_teams = {}
+    for team in teams:
+        for student in team["students"]:
+            student_teams[student["studentId"]] = team["team_name"]
+    team_names = list(dict.fromkeys(team["team_name"] for team in teams))
+    reviews = min(reviews_per_student, max(len(team_names) - 1, 0))
+
+    rng.shuffle(team_names)
+    students = list(student_teams)
+    rng.shuffle(students)
+
+    buckets: Dict[int, Dict[str, None]] = defaultdict(dict)  # 배정 수 → 팀 (삽입 순서 유지)
+    buckets[0] = dict.fromkeys(team_names)
+    counts = dict.fromkeys(team_names, 0)
+    min_count = 0
+
+    evaluations = {}
+    for student_id in students:
+        own_team = student_teams[student_id]
+        chosen = []
+        level = min_count
+        while len(chosen) < reviews:
+            for team_name in buckets.get(level, ()):
+                if team_name != own_team:
+                    chosen.append(team_name)
+                    if len(chosen) == reviews:
+                        break
+            level += 1
+        for team_name in chosen:
+            del buckets[counts[team_name]][team_name]
+            counts[team_name] += 1
+            buckets[counts[team_name]][team_name] = None
+        while reviews and not buckets[min_count]:
+            min_count += 1
+        evaluations[student_id] = chosen
+    return evaluations
+
+def evaluation_assignment_ops(course_code: str, evaluations: Dict[str, List[str]], fields: dict) -> List[ReplaceOne]:
+    # (course_code, studentId)당 하나의 배정 문서
+    return [
+        ReplaceOne(
+            {"course_code": course_code, "studentId": student_id},
+            {"course_code": course_code, "studentId": student_id, "teams": teams, **fields},
+            upsert=True
+        )
+        for student_id, teams in evaluations.items()
+    ]
+
+async def write_evaluation_assignments(course_code: str, evaluations: Dict[str, List[str]], **fields):
+    """학생별 배정 문서를 upsert하고, 이번 배정에 없는 학생 문서와 구 형식(evaluations 맵) 문서를 지웁니다."""
+    operations = evaluation_assignment_ops(course_code, evaluations, fields)
+    operations.append(DeleteMany({"course_code": course_code, "studentId": {"$nin": list(evaluations)}}))
+    await evaluation_assignment_collection.bulk_write(operations, ordered=True)
+
+async def migrate_evaluation_assignments(batch_size: int = 500) -> int:
+    """코스당 하나의 evaluations 맵 문서를 (course_code, studentId)별 문서로 분리합니다. 여러 번 실행해도 안전합니다."""
+    migrated = 0
+    async for legacy in evaluation_assignment_collection.find({"evaluations": {"$exists": True}}):
+        fields = {key: legacy[key] for key in ("seed", "reviews", "started_at") if key in legacy}
+        evaluations = legacy.get("evaluations") or {}
+        students = iter(evaluations.items())
+        while True:
+            batch = dict(islice(students, batch_size))
+            if not batch:
+                break
+            await evaluation_assignment_collection.bulk_write(
+                evaluation_assignment_ops(legacy["course_code"], batch, fields), ordered=False
+            )
+        await evaluation_assignment_collection.delete_one({"_id": legacy["_id"]})
+        migrated += len(evaluations)
+    return migrated
+
+async def migrate_course_teams() -> int:
+    """코스당 하나의 teams 배열 문서를 팀별 문서로 분리하고 평가 기준 문서의 team_count를 맞춥니다. 여러 번 실행해도 안전합니다."""
+    migrated = 0
+    async for legacy in course_team_collection.find({"teams": {"$exists": True}}):
+        operations = [
+            UpdateOne(
+                {"course_code": legacy["course_code"], "team_name": team["team_name"]},
+                {"$addToSet": {"students": {"$each": team.get("students", [])}}},
+                upsert=True
+            )
+            for team in legacy.get("teams") or []
+        ]
+        if operations:
+            await course_team_collection.bulk_write(operations, ordered=False)
+        await course_team_collection.delete_one({"_id": legacy["_id"]})
+        migrated += len(operations)
+
+    for course_code in await course_team_collection.distinct("course_code"):
+        team_count = await course_team_collection.count_documents({"course_code": course_code})
+        await evaluation_collection.update_one({"course_code": course_code}, {"$set": {"team_count": team_count}})
+    return migrated
 
 # 평가 시작 API
 @app.post("/api/start-evaluation/{course_code}")
-async def start_evaluation(course_code: str):
-    teams = await course_team_collection.find_one({"course_code": course_code})
+async def start_evaluation(course_code: str, seed: Optional[int] = Query(None), reviews: int = Query(3, ge=1)):
+    teams = await course_team_collection.find({"course_code": course_code}, {"_id": 0, "team_name": 1, "students": 1}).to_list(None)
     if not teams:
         raise HTTPException(status_code=404, detail="No teams found for the course")
 
-    evaluations = defaultdict(list)
-    for team in teams["teams"]:
-        for student in team["students"]:
-            available_teams = [t["team_name"] for t in teams["teams"] if t["team_name"] != team["team_name"]]
-            evaluations[student["studentId"]] = random.sample(available_teams, min(3, len(available_teams)))
+    # seed를 저장해 두면 같은 배정을 다시 만들 수 있음
+    if seed is None:
+        seed = random.randrange(2 ** 31)
+    evaluations = assign_evaluations(teams, reviews, seed)
 
-    for student_id, assigned_teams in evaluations.items():
-        await evaluation_assignment_collection.update_one(
-            {"course_code": course_code},
-            {"$set": {f"evaluations.{student_id}": assigned_teams}},
-            upsert=True
-        )
+    await write_evaluation_assignments(course_code, evaluations, seed=seed, reviews=reviews, started_at=datetime.now())
+
+    return {"message": "Evaluation started successfully", "seed": seed}
 
-    return {"message": "Evaluation started successfully"}
+def evaluation_completion_pipeline(course_code: str, team_names: Optional[List[str]] = None) -> List[dict]:
+    """
+    배정 문서를 팀별로 묶은 뒤 팀마다 한 번만 EvaluationResult를 조회하고, 배정된 평가자와 실제 평가자의 교집합을 구합니다.
+    team_names를 주면 그 팀이 포함된 배정 문서만 (course_code, teams) 인덱스로 읽고 해당 팀만 묶습니다.
+    """
+    if team_names is None:
+        pipeline = [
+            {"$match": {"course_code": course_code}},
+            {"$unwind": "$teams"},
+        ]
+    else:
+        pipeline = [
+            {"$match": {"course_code": course_code, "teams": {"$in": team_names}}},
+            {"$unwind": "$teams"},
+            {"$match": {"teams": {"$in": team_names}}},
+        ]
+    pipeline += [
+        {"$group": {"_id": "$teams", "assigned": {"$addToSet": "$studentId"}}},
+        {"$lookup": {
+            "from": "EvaluationResult",
+            "let": {"team_name": "$_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [{"$eq": ["$course_code", course_code]}, {"$eq": ["$team_name", "$$team_name"]}]}}},
+                {"$project": {"_id": 0, "evaluators": {"$ifNull": ["$evaluations.evaluator_id", []]}}}
+            ],
+            "as": "result"
+        }},
+        {"$set": {"evaluators": {"$ifNull": [{"$first": "$result.evaluators"}, []]}}},
+        {"$project": {
+            "_id": 0,
+            "team_name": "$_id",
+            "assigned": 1,
+            "completed": {"$setIntersection": ["$assigned", "$evaluators"]},
+            "received": {"$size": "$evaluators"}
+        }},
+        {"$sort": {"team_name": 1}}
+    ]
+    return pipeline
+
+def merge_evaluation_completion(teams: List[dict]) -> List[dict]:
+    """팀별 배정/완료 목록을 학생별 완료·미완료 팀 목록으로 뒤집습니다 (배정 수에 대해 O(n))."""
+    students = {}
+    for team in teams:
+        completed = set(team["completed"])
+        for student_id in team["assigned"]:
+            student = students.setdefault(student_id, {"studentId": student_id, "completed_teams": [], "pending_teams": []})
+            key = "completed_teams" if student_id in completed else "pending_teams"
+            student[key].append(team["team_name"])
+    for student in students.values():
+        student["completed"] = len(student["completed_teams"])
+        student["pending"] = len(student["pending_teams"])
+    return sorted(students.values(), key=lambda student: (-student["pending"], student["studentId"]))
+
+# 평가 완료 현황 API
+# since를 주면 그 이후 평가가 들어온 팀만 계산하며, 이때 students는 그 팀들에 대한 완료/미완료만 담음
+@app.get("/api/evaluation-progress/{course_code}/completion")
+async def get_evaluation_completion(course_code: str, since: Optional[datetime] = Query(None)):
+    as_of = datetime.now()
+    changed = None
+    if since is not None:
+        changed = await evaluation_result_collection.distinct("team_name", {"course_code": course_code, "updated_at": {"$gt": since}})
+    if changed == []:
+        teams = []
+    else:
+        teams = await evaluation_assignment_collection.aggregate(evaluation_completion_pipeline(course_code, changed)).to_list(None)
+    if not teams and since is None:
+        raise HTTPException(status_code=404, detail="Evaluation assignments not found")
+
+    return {
+        "course_code": course_code,
+        "as_of": as_of,
+        "incremental": since is not None,
+        "teams": [
+            {"team_name": team["team_name"], "assigned": len(team["assigned"]), "completed": len(team["completed"]), "received": team["received"]}
+            for team in teams
+        ],
+        "students": merge_evaluation_completion(teams)
+    }
 
 # 코스 생성 API
 @app.post("/api/courses")
 async def create_course(course: Course):
     course_dict = course.dict()
     result = await course_collection.insert_one(course_dict)
+    professor_name_cache.pop(course.professor_id, None)
     return {"id": str(result.inserted_id)}
 
 # 코스 목록 조회 API
@@ -1109,10 +1928,13 @@ async def get_students_by_course(course_code: str):
 # 코스 팀 목록 조회 API
 @app.get("/api/courses/{course_code}/teams")
 async def get_teams_by_course(course_code: str):
-    teams = await course_team_collection.find_one({"course_code": course_code})
+    # 팀별 문서를 생성 순서대로 모아 기존 응답 형태({"course_code", "teams"})로 반환
+    teams = await course_team_collection.find(
+        {"course_code": course_code}, {"_id": 0, "team_name": 1, "students": 1}
+    ).sort("_id", 1).to_list(None)
     if not teams:
         raise HTTPException(status_code=404, detail="No teams found for the course")
-    return convert_objectid_to_str(teams)
+    return {"course_code": course_code, "teams": teams}
 
 # 최대 팀 수 조회 API
 @app.get("/api/courses/{course_code}/max_teams")
@@ -1176,6 +1998,120 @@ class ReservationData(BaseModel):
 
 
 
+# 주간 가용 시간 비트맵: 요일(월~일) × 하루 슬롯, 비트 = 예약 가능한 시작 시각
+# 프론트엔드의 간격 선택지(15/30/45/60분)를 모두 표현할 수 있도록 15분 해상도를 사용
+AVAILABILITY_SLOT_MINUTES = 15
+AVAILABILITY_DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+SLOTS_PER_DAY = 24 * 60 // AVAILABILITY_SLOT_MINUTES
+SLOTS_PER_WEEK = SLOTS_PER_DAY * len(AVAILABILITY_DAYS)
+
+def parse_minutes(time: str) -> int:
+    hours, minutes = time.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+def slot_position(day: str, time: str) -> Optional[int]:
+    """(요일, "HH:MM")를 비트 위치로 변환합니다. 해상도에 맞지 않는 시각은 해당 슬롯의 시작으로 내림합니다."""
+    if day not in AVAILABILITY_DAYS:
+        return None
+    try:
+        minutes = parse_minutes(time)
+    except (ValueError, AttributeError):
+        return None
+    if not 0 <= minutes < 24 * 60:
+        return None
+    return AVAILABILITY_DAYS.index(day) * SLOTS_PER_DAY + minutes // AVAILABILITY_SLOT_MINUTES
+
+def exact_slot_position(day: str, time: str) -> Optional[int]:
+    # 예약용: "H:MM", "HH:MM", "HH:MM:00" 중 슬롯 시작 시각과 정확히 일치하는 경우만 허용 (내림하지 않음)
+    match = re.fullmatch(r"(\d{1,2}):(\d{2})(?::00)?", time or "")
+    if not match or int(match.group(2)) >= 60 or int(match.group(2)) % AVAILABILITY_SLOT_MINUTES:
+        return None
+    return slot_position(day, f"{match.group(1)}:{match.group(2)}")
+
+def slot_label(position: int) -> dict:
+    day, slot = divmod(position, SLOTS_PER_DAY)
+    minutes = slot * AVAILABILITY_SLOT_MINUTES
+    return {"day": AVAILABILITY_DAYS[day], "time": f"{minutes // 60:02d}:{minutes % 60:02d}"}
+
+def compile_availability(weekly_schedule: dict, unavailable_times: List[dict]) -> int:
+    """weeklySchedule의 start~end를 interval 간격으로 나눈 시작 시각들에서 unavailableTimes를 뺀 비트맵을 만듭니다."""
+    bitmap = 0
+    for day, schedule in (weekly_schedule or {}).items():
+        if not schedule or not schedule.get("start") or not schedule.get("end"):
+            continue
+        if day not in AVAILABILITY_DAYS:
+            continue
+        day_base = AVAILABILITY_DAYS.index(day) * SLOTS_PER_DAY
+        start, end = parse_minutes(schedule["start"]), parse_minutes(schedule["end"])
+        interval = int(schedule.get("interval") or 30)
+        if interval <= 0:
+            continue
+        for minutes in range(start, min(end, 24 * 60), interval):
+            bitmap |= 1 << (day_base + minutes // AVAILABILITY_SLOT_MINUTES)
+    for slot in unavailable_times or []:
+        position = slot_position(slot["day"], slot["time"])
+        if position is not None:
+            bitmap &= ~(1 << position)
+    return bitmap
+
+class AvailabilityIndex:
+    """
+    교수별 주간 비트맵과 슬롯별 교수 비트마스크를 함께 유지하는 메모리 인덱스.
+    "슬롯 S에 가능한 교수"는 슬롯 마스크의 비트를, "교수 P의 다음 가능 슬롯"은 주간 비트맵의 최하위 비트를 읽습니다.
+    """
+    def __init__(self):
+        self._bitmaps: Dict[str, int] = {}  # professor_id → 주간 비트맵
+        self._bits: Dict[str, int] = {}  # professor_id → 슬롯 마스크에서의 비트 번호
+        self._professors: List[str] = []
+        self._slots = [0] * SLOTS_PER_WEEK  # 슬롯 → 가능한 교수 비트마스크
+
+    def update(self, professor_id: str, bitmap: int):
+        if professor_id not in self._bits:
+            self._bits[professor_id] = len(self._professors)
+            self._professors.append(professor_id)
+        bit = 1 << self._bits[professor_id]
+        changed = self._bitmaps.get(professor_id, 0) ^ bitmap
+        while changed:
+            position = (changed & -changed).bit_length() - 1
+            self._slots[position] ^= bit
+            changed &= changed - 1
+        self._bitmaps[professor_id] = bitmap
+
+    def bitmap(self, professor_id: str) -> Optional[int]:
+        return self._bitmaps.get(professor_id)
+
+    def free_professors(self, position: int) -> List[str]:
+        mask = self._slots[position]
+        professors = []
+        while mask:
+            professors.append(self._professors[(mask & -mask).bit_length() - 1])
+            mask &= mask - 1
+        return professors
+
+    def next_free_slot(self, professor_id: str, position: int) -> Optional[int]:
+        # position 이후의 비트를 먼저 보고, 없으면 주 초부터 다시 찾음
+        bitmap = self._bitmaps.get(professor_id, 0)
+        for candidates in (bitmap >> position << position, bitmap):
+            if candidates:
+                return (candidates & -candidates).bit_length() - 1
+        return None
+
+    async def load(self, collection):
+        # 저장된 slotBitmap을 우선 사용하고, 문서 하나가 잘못되어도 나머지는 계속 적재
+        async for availability in collection.find({}, {"userId": 1, "weeklySchedule": 1, "unavailableTimes": 1, "slotBitmap": 1}):
+            if not availability.get("userId"):
+                continue
+            try:
+                if availability.get("slotBitmap"):
+                    bitmap = int(availability["slotBitmap"], 16)
+                else:
+                    bitmap = compile_availability(availability.get("weeklySchedule"), availability.get("unavailableTimes"))
+                self.update(availability["userId"], bitmap)
+            except Exception as e:
+                logger.warning("Skipping availability for %s: %s", availability["userId"], str(e))
+
+availability_index = AvailabilityIndex()
+
 async def get_professor_id_by_email(email: str) -> Optional[str]:
     professor = await professor_collection.find_one({"email": email})
     if professor:
@@ -1199,14 +2135,33 @@ async def save_availability(data: AvailabilityData):
         if not course:
             raise HTTPException(status_code=404, detail="Course not found")
 
+        for day, schedule in data.weeklySchedule.items():
+            if not isinstance(schedule, dict):
+                continue
+            try:
+                interval = int(schedule.get("interval") or 30)
+                for key in ("start", "end"):
+                    if schedule.get(key):
+                        parse_minutes(schedule[key])
+            except (ValueError, TypeError, AttributeError):
+                raise HTTPException(status_code=400, detail=f"Invalid schedule for {day}")
+            if interval <= 0:
+                raise HTTPException(status_code=400, detail=f"Interval for {day} must be positive")
+
         data_dict = data.dict()
         data_dict["userId"] = professor_id
+        # 예약 시 다시 파싱하지 않도록 컴파일한 비트맵을 함께 저장 (64비트를 넘으므로 16진 문자열)
+        bitmap = compile_availability(data_dict["weeklySchedule"], data_dict["unavailableTimes"])
+        data_dict["slotBitmap"] = format(bitmap, "x")
         existing_data = await availability_collection.find_one({"userId": professor_id})
         if existing_data:
             await availability_collection.update_one({"userId": professor_id}, {"$set": data_dict})
         else:
             await availability_collection.insert_one(data_dict)
+        availability_index.update(professor_id, bitmap)
         return {"message": "Availability settings saved successfully!"}
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1232,37 +2187,162 @@ async def get_availability(email: str = Query(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# 교수 ID → 이름 캐시 (create_course에서 무효화)
+professor_name_cache = TTLCache(maxsize=1000, ttl=600)
+
+async def load_professor_names(professor_ids: set) -> Dict[str, str]:
+    """교수 이름을 Course 콜렉션에서 최대 한 번의 $in 쿼리로 조회합니다. 이름이 없으면 "No Name Available"."""
+    missing = [professor_id for professor_id in professor_ids if professor_id not in professor_name_cache]
+    if missing:
+        found = {}
+        async for course in course_collection.find({"professor_id": {"$in": missing}}, {"professor_id": 1, "professor": 1}):
+            found.setdefault(course["professor_id"], course.get("professor") or "No Name Available")
+        for professor_id in missing:
+            professor_name_cache[professor_id] = found.get(professor_id, "No Name Available")
+    return {professor_id: professor_name_cache.get(professor_id, "No Name Available") for professor_id in professor_ids}
+
 @app.get("/reservations/user")
 async def get_user_reservations(user_id: str):
     try:
-        reservations = await db.reservations.find({"studentUserId": user_id}).to_list(None)
+        reservations = await reservations_collection.find({"studentUserId": user_id}).to_list(None)
+        professor_names = await load_professor_names({reservation["userId"] for reservation in reservations})
         for reservation in reservations:
             reservation["_id"] = str(reservation["_id"])
-            logging.info(f"Reservation found: {reservation}")
-
-            # 교수 정보를 course 컬렉션에서 조회
-            professor_course = await db.Course.find_one({"professor_id": reservation["userId"]})
-            logging.info(f"Professor course data: {professor_course}")
-
-            if professor_course:
-                reservation["professor_name"] = professor_course.get("professor", "No Name Available")
-            else:
-                reservation["professor_name"] = "No Name Available"
+            reservation["professor_name"] = professor_names[reservation["userId"]]
         return reservations
     except Exception as e:
         logging.error(f"Error fetching user reservations: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/reservations/")
-async def get_reservations():
+async def get_reservations(response: Response, userId: Optional[str] = Query(None), email: Optional[str] = Query(None),
+                           date: Optional[str] = Query(None), limit: int = Query(500, ge=1, le=5000),
+                           cursor: Optional[str] = Query(None, alias="next")):
     try:
-        reservations = await reservations_collection.find().to_list(None)
+        # 교수(userId 또는 이메일)와 날짜로 범위를 좁히고 페이지 단위로 반환
+        query = {}
+        if email and not userId:
+            userId = await get_professor_id_by_email(email)
+            if not userId:
+                raise HTTPException(status_code=404, detail="Professor not found")
+        if userId:
+            query["userId"] = userId
+        if date:
+            query["date"] = date
+        reservations = await fetch_page(reservations_collection, response, limit, cursor, query=query)
         for reservation in reservations:
             reservation["_id"] = str(reservation["_id"])
         return reservations
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# 슬롯 S(요일, 시각)에 가능한 교수 조회 API
+@app.get("/availability/free-professors")
+async def get_free_professors(day: str = Query(...), time: str = Query(...)):
+    position = slot_position(day, time)
+    if position is None:
+        raise HTTPException(status_code=400, detail="Invalid day or time.")
+    return {**slot_label(position), "professors": availability_index.free_professors(position)}
+
+# 교수 P의 다음 가능 슬롯 조회 API (주 단위로 순환)
+@app.get("/availability/{professor_id}/next-free")
+async def get_next_free_slot(professor_id: str, day: str = Query(...), time: str = Query(...)):
+    position = slot_position(day, time)
+    if position is None:
+        raise HTTPException(status_code=400, detail="Invalid day or time.")
+    next_position = availability_index.next_free_slot(professor_id, position)
+    if next_position is None:
+        raise HTTPException(status_code=404, detail="No available slot found.")
+    return slot_label(next_position)
+
+def week_dates(week: Optional[str]) -> List[datetime]:
+    # week는 해당 주의 아무 날짜(YYYY-MM-DD), 없으면 이번 주. 월요일부터 7일을 반환
+    day = datetime.strptime(week, "%Y-%m-%d") if week else datetime.now()
+    monday = (day - timedelta(days=day.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    return [monday + timedelta(days=offset) for offset in range(len(AVAILABILITY_DAYS))]
+
+# 주간 슬롯별 잔여 인원 조회 API
+@app.get("/availability/{professor_id}/slots")
+async def get_availability_slots(professor_id: str, week: Optional[str] = Query(None)):
+    availability = await availability_collection.find_one(
+        {"userId": professor_id}, {"weeklySchedule": 1, "unavailableTimes": 1, "slotBitmap": 1}
+    )
+    if not availability:
+        raise HTTPException(status_code=404, detail="No availability settings found.")
+    try:
+        dates = [day.strftime("%Y-%m-%d") for day in week_dates(week)]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="week must be a date in YYYY-MM-DD format.")
+
+    weekly_schedule = availability.get("weeklySchedule") or {}
+    if "slotBitmap" in availability:
+        bitmap = int(availability["slotBitmap"], 16)
+    else:
+        bitmap = compile_availability(weekly_schedule, availability.get("unavailableTimes"))
+
+    # 한 번의 그룹 집계로 그 주의 (날짜, 시간)별 예약 수를 구함
+    reserved = {}
+    pipeline = [
+        {"$match": {"userId": professor_id, "date": {"$in": dates}}},
+        {"$group": {"_id": {"date": "$date", "time": "$time"}, "count": {"$sum": 1}}}
+    ]
+    async for slot in reservations_collection.aggregate(pipeline):
+        position = slot_position(AVAILABILITY_DAYS[dates.index(slot["_id"]["date"])], slot["_id"]["time"])
+        if position is not None:
+            reserved[position] = reserved.get(position, 0) + slot["count"]
+
+    slots = []
+    while bitmap:
+        position = (bitmap & -bitmap).bit_length() - 1
+        bitmap &= bitmap - 1
+        label = slot_label(position)
+        capacity = int((weekly_schedule.get(label["day"]) or {}).get("maxCapacity") or 1)
+        count = reserved.get(position, 0)
+        slots.append({
+            "date": dates[position // SLOTS_PER_DAY],
+            **label,
+            "capacity": capacity,
+            "reserved": count,
+            "remaining": max(capacity - count, 0)
+        })
+    return slots
+
+async def reserve_slot(professor_id: str, date: str, time: str, capacity: int) -> bool:
+    """
+    (교수, 날짜, 시간) 슬롯의 예약 수를 maxCapacity 미만일 때만 1 증가시킵니다.
+    슬롯이 가득 차 있으면 필터가 일치하지 않아 upsert가 고유 인덱스에 막히므로 False를 반환합니다.
+    """
+    if capacity < 1:
+        return False
+    try:
+        await reservation_slot_collection.find_one_and_update(
+            {"userId": professor_id, "date": date, "time": time, "count": {"$lt": capacity}},
+            {"$inc": {"count": 1}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+async def release_slot(professor_id: str, date: str, time: str):
+    await reservation_slot_collection.update_one(
+        {"userId": professor_id, "date": date, "time": time, "count": {"$gt": 0}},
+        {"$inc": {"count": -1}}
+    )
+
+async def migrate_reservation_slots() -> int:
+    """기존 예약을 (교수, 날짜, 시간)별로 세어 슬롯 카운터를 다시 채웁니다. 여러 번 실행해도 안전합니다."""
+    pipeline = [{"$group": {"_id": {"userId": "$userId", "date": "$date", "time": "$time"}, "count": {"$sum": 1}}}]
+    operations = [
+        UpdateOne(slot["_id"], {"$set": {"count": slot["count"]}}, upsert=True)
+        async for slot in reservations_collection.aggregate(pipeline)
+    ]
+    if operations:
+        await reservation_slot_collection.bulk_write(operations, ordered=False)
+    return len(operations)
+
 @app.post("/reservation/")
 async def make_reservation(data: ReservationData):
     try:
@@ -1271,25 +2351,105 @@ async def make_reservation(data: ReservationData):
             raise HTTPException(status_code=404, detail="No availability settings found.")
 
         weekly_schedule = availability['weeklySchedule']
-        unavailable_times = availability['unavailableTimes']
+        if "slotBitmap" in availability:
+            bitmap = int(availability["slotBitmap"], 16)
+        else:
+            bitmap = compile_availability(weekly_schedule, availability['unavailableTimes'])
 
-        if data.day not in weekly_schedule or not weekly_schedule[data.day]['start'] or not weekly_schedule[data.day]['end']:
+        position = exact_slot_position(data.day, data.time)
+        if position is None or data.day not in weekly_schedule or not weekly_schedule[data.day]['start'] or not weekly_schedule[data.day]['end']:
             raise HTTPException(status_code=400, detail="Invalid reservation time.")
+        try:
+            reservation_date = datetime.strptime(data.date, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid reservation date.")
+        if reservation_date.strftime("%A") != data.day:
+            raise HTTPException(status_code=400, detail="The reservation date does not fall on the selected day.")
 
-        if any(slot['day'] == data.day and slot['time'] == data.time for slot in unavailable_times):
+        if not bitmap >> position & 1:
             raise HTTPException(status_code=400, detail="The selected time is unavailable.")
 
-        existing_reservations = await reservations_collection.count_documents({"day": data.day, "time": data.time})
-        if existing_reservations >= weekly_schedule[data.day]['maxCapacity']:
+        # 슬롯 카운터와 예약 문서가 같은 키를 쓰도록 날짜와 시각을 정규화
+        data.date = reservation_date.strftime("%Y-%m-%d")
+        data.time = slot_label(position)["time"]
+
+        if not await reserve_slot(data.userId, data.date, data.time, int(weekly_schedule[data.day]['maxCapacity'])):
             raise HTTPException(status_code=400, detail="The selected time is fully booked.")
 
-        result = await reservations_collection.insert_one(data.dict())
+        try:
+            result = await reservations_collection.insert_one(data.dict())
+        except Exception:
+            await release_slot(data.userId, data.date, data.time)
+            raise
         return {"message": "Reservation saved successfully!", "id": str(result.inserted_id)}
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# 교수 디렉터리 조회 구현 선택: aggregate($lookup 한 번) 또는 legacy(교수별 find_one)
+PROFESSOR_DIRECTORY_IMPL = os.getenv("PROFESSOR_DIRECTORY_IMPL", "aggregate")
+
+def professor_name_lookup(local_field: str) -> dict:
+    # Course 콜렉션에서 교수 ID로 첫 번째 수업의 교수 이름만 가져오는 $lookup 단계
+    return {
+        "$lookup": {
+            "from": course_collection.name,
+            "let": {"pid": local_field},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$professor_id", "$$pid"]}}},
+                {"$limit": 1},
+                {"$project": {"_id": 0, "professor": 1}}
+            ],
+            "as": "course"
+        }
+    }
+
+def professor_directory_projection(professor_id_field: str) -> dict:
+    return {
+        "$project": {
+            "_id": 0,
+            "professor_id": {"$ifNull": [professor_id_field, None]},
+            "email": {"$ifNull": ["$email", None]},
+            "name": {"$ifNull": [{"$arrayElemAt": ["$course.professor", 0]}, "No Name Available"]}
+        }
+    }
+
+PROFESSORS_PIPELINE = [
+    professor_name_lookup("$professor_id"),
+    professor_directory_projection("$professor_id")
+]
+
+AVAILABLE_PROFESSORS_PIPELINE = [
+    {
+        "$lookup": {
+            "from": professor_collection.name,
+            "let": {"pid": "$userId"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$professor_id", "$$pid"]}}},
+                {"$limit": 1},
+                {"$project": {"_id": 0, "email": 1}}
+            ],
+            "as": "professor"
+        }
+    },
+    {"$unwind": "$professor"},  # 교수 정보가 없는 일정은 제외
+    {"$set": {"email": "$professor.email"}},
+    professor_name_lookup("$userId"),
+    professor_directory_projection("$userId")
+]
+
+def resolve_directory_impl(impl: Optional[str]) -> str:
+    impl = impl or PROFESSOR_DIRECTORY_IMPL
+    if impl not in ("aggregate", "legacy"):
+        raise HTTPException(status_code=400, detail="impl must be 'aggregate' or 'legacy'")
+    return impl
+
 @app.get("/api/professors")
-async def get_professors():
+async def get_professors(impl: Optional[str] = Query(None)):
+    if resolve_directory_impl(impl) == "aggregate":
+        return await professor_collection.aggregate(PROFESSORS_PIPELINE).to_list(None)
+
     professors = []
     async for professor in professor_collection.find():
         professor_id = professor.get("professor_id")
@@ -1307,11 +2467,13 @@ async def get_professors():
             "name": professor_name
         }
         professors.append(professor_data)
-    print(professors)  # 로깅 추가
     return professors
 
 @app.get("/api/professors/available")
-async def get_available_professors():
+async def get_available_professors(impl: Optional[str] = Query(None)):
+    if resolve_directory_impl(impl) == "aggregate":
+        return await availability_collection.aggregate(AVAILABLE_PROFESSORS_PIPELINE).to_list(None)
+
     professors = []
     async for availability in availability_collection.find():
         professor_id = availability.get("userId")
@@ -1329,7 +2491,6 @@ async def get_available_professors():
             "name": professor_name
         }
         professors.append(professor_data)
-    print(professors)  # 로깅 추가
     return professors
 
 
@@ -1385,6 +2546,7 @@ async def classify_text(request: ClassificationRequest):
         return {"category": "others"}
 
 class CodeAnswer(BaseModel):
+    id: str = Field(default_factory=lambda: str(ObjectId()))  # 답변 고유 ID (목록 인덱스 대신 사용)
     lineNumber: int
     text: str
     userId: str
@@ -1393,6 +2555,7 @@ class CodeAnswer(BaseModel):
     createdAt: datetime = Field(default_factory=datetime.now)
 
 class GeneralAnswer(BaseModel):
+    id: str = Field(default_factory=lambda: str(ObjectId()))  # 답변 고유 ID (목록 인덱스 대신 사용)
     text: str
     userId: str
     userTitle: str = "Beginner"  # Default title
@@ -1427,6 +2590,23 @@ class QuestionInDB(BaseModel):
     codeAnswers: Dict[str, List[Dict]] = {}
     generalAnswers: List[Dict] = []
 
+class QuestionFields(BaseModel):
+    # fields= 로 일부 필드만 조회할 때 사용하는 응답 모델 (조회한 필드만 반환)
+    id: str
+    title: Optional[str] = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    customCategories: Optional[List[str]] = None
+    code: Optional[str] = None
+    userId: Optional[str] = None
+    createdAt: Optional[datetime] = None
+    codeAnswers: Optional[Dict[str, List[Dict]]] = None
+    generalAnswers: Optional[List[Dict]] = None
+
+QUESTION_FIELDS = set(QuestionFields.model_fields) - {"id"}
+# 질문 목록 카드에 필요한 필드 (code, codeAnswers, generalAnswers 제외)
+QUESTION_LIST_FIELDS = ("title", "description", "category", "customCategories", "userId", "createdAt")
+
 class Score(BaseModel):
     studentId: str
     scores: Dict[str, float]
@@ -1476,37 +2656,322 @@ titles = {
 }
 
 
+# 카테고리별 칭호 기준표를 한 번만 정렬해 둠: category → (오름차순 기준점 목록, 칭호 목록)
+TITLE_TABLES = {
+    category: (sorted(thresholds), [thresholds[threshold] for threshold in sorted(thresholds)])
+    for category, thresholds in titles.items()
+}
+
 def get_title(category: str, points: float) -> str:
-    thresholds = sorted(titles[category].keys(), reverse=True)
-    for threshold in thresholds:
-        if points >= threshold:
-            return titles[category][threshold]
-    return "Undefined Title"
-
-async def update_scores(student_id: str, category: str, points: float) -> Tuple[Dict[str, float], str]:
-    score_doc = await scores_collection.find_one({"studentId": student_id})
-    new_title = ""
-    if score_doc:
-        new_scores = score_doc["scores"]
-        new_titles = score_doc.get("titles", {})
-        if category in new_scores:
-            new_scores[category] = max(0, new_scores[category] + points)
-        else:
-            new_scores[category] = max(0, points)
-        new_title = get_title(category, new_scores[category])
-        new_titles[category] = new_title
-        await scores_collection.update_one(
-            {"_id": score_doc["_id"]},
-            {"$set": {"scores": new_scores, "titles": new_titles}}
-        )
+    thresholds, names = TITLE_TABLES[category]
+    index = bisect_right(thresholds, points) - 1
+    return names[index] if index >= 0 else "Undefined Title"
+
+def title_switch(category: str, score_expr: str) -> dict:
+    # get_title과 같은 기준표를 서버 측 $switch 식으로 변환
+    thresholds, names = TITLE_TABLES[category]
+    return {
+        "$switch": {
+            "branches": [
+                {"case": {"$gte": [score_expr, threshold]}, "then": name}
+                for threshold, name in reversed(list(zip(thresholds, names)))
+            ],
+            "default": "Undefined Title"
+        }
+    }
+
+async def update_scores(student_id: str, category: str, points: float, source: Optional[dict] = None) -> Tuple[Dict[str, float], str]:
+    """
+    점수 증감을 ScoreLedger에 이벤트로 기록한 뒤, 학생별 스냅샷(scores 문서)을
+    하나의 find_one_and_update(upsert, 파이프라인 업데이트)로 갱신합니다.
+    점수는 0 미만으로 내려가지 않으며, 동시 요청에도 증감분이 유실되지 않습니다.
+    """
+    score_field = f"scores.{category}"
+    title_expr = title_switch(category, f"${score_field}")  # 알 수 없는 카테고리는 기록 전에 실패
+
+    # 원장 도입 전 문서를 처음 건드리면 기존 점수를 opening balance로 먼저 기록 (학생당 한 번만 확인)
+    if student_id not in ledger_seeded_students:
+        await claim_opening_balance({"studentId": student_id})
+        ledger_seeded_students[student_id] = True
+
+    event = await score_ledger_collection.insert_one({
+        "studentId": student_id,
+        "category": category,
+        "points": points,
+        "source": source,
+        "created_at": datetime.now()
+    })
+    score_doc = await scores_collection.find_one_and_update(
+        {"studentId": student_id},
+        [
+            {"$set": {score_field: {"$max": [0, {"$add": [{"$ifNull": [f"${score_field}", 0]}, points]}]}}},
+            {"$set": {
+                f"titles.{category}": title_expr,
+                "total_score": TOTAL_SCORE_EXPR,
+                "last_event_id": {"$max": ["$last_event_id", event.inserted_id]}
+            }}
+        ],
+        projection={"scores": 1, f"titles.{category}": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+    title_cache.pop(student_id, None)
+    if LEADERBOARD_IN_MEMORY:
+        leaderboard.update(student_id, score_doc["scores"])
+    return score_doc["scores"], score_doc["titles"][category]
+
+
+def apply_score_event(scores: Dict[str, float], category: str, points: float):
+    # update_scores의 파이프라인과 같은 규칙 (0 미만으로 내려가지 않음)
+    scores[category] = max(0, scores.get(category, 0) + points)
+
+def score_snapshot(scores: Dict[str, float], last_event_id: ObjectId) -> dict:
+    return {
+        "scores": scores,
+        "titles": {category: get_title(category, score) for category, score in scores.items()},
+        "total_score": sum(scores.values()),
+        "last_event_id": last_event_id
+    }
+
+async def rebuild_scores_from_ledger(batch_size: int = 1000) -> Tuple[int, int]:
+    """
+    ScoreLedger를 (studentId, _id) 순서로 스트리밍하며 모든 학생의 점수와 칭호를 다시 계산합니다.
+    메모리에는 현재 학생 한 명의 점수와 batch_size개의 쓰기 연산만 유지합니다.
+    실행 중 들어온 점수 변경은 덮어쓸 수 있으므로 사용량이 적을 때 실행하세요.
+    실행 중인 서버의 메모리 리더보드는 서버 재시작 시 다시 로드됩니다.
+    반환값: (갱신된 학생 수, 처리한 이벤트 수)
+    """
+    students, events = 0, 0
+    operations = []
+    student_id, scores, last_event_id = None, {}, None
+
+    cursor = score_ledger_collection.find({}, {"studentId": 1, "category": 1, "points": 1}, batch_size=10000)
+    async for event in cursor.sort([("studentId", 1), ("_id", 1)]):
+        if event["studentId"] != student_id:
+            if student_id is not None:
+                operations.append(UpdateOne({"studentId": student_id}, {"$set": score_snapshot(scores, last_event_id)}, upsert=True))
+                students += 1
+            if len(operations) >= batch_size:
+                await scores_collection.bulk_write(operations, ordered=False)
+                operations = []
+            student_id, scores = event["studentId"], {}
+        apply_score_event(scores, event["category"], event["points"])
+        last_event_id = event["_id"]
+        events += 1
+
+    if student_id is not None:
+        operations.append(UpdateOne({"studentId": student_id}, {"$set": score_snapshot(scores, last_event_id)}, upsert=True))
+        students += 1
+    if operations:
+        await scores_collection.bulk_write(operations, ordered=False)
+
+    title_cache.clear()
+    return students, events
+
+# 이 프로세스에서 opening balance 여부를 이미 확인한 학생 (update_scores의 추가 조회를 학생당 한 번으로 제한)
+ledger_seeded_students = TTLCache(maxsize=100000, ttl=3600)
+
+async def claim_opening_balance(query: dict) -> Optional[dict]:
+    """
+    원장 도입 전 scores 문서(last_event_id 없음)를 ledger_seeded로 표시하고, 표시 직전의 점수를
+    학생·카테고리별 opening balance 이벤트로 기록합니다. update_scores와 seed_score_ledger 중 먼저 표시한 쪽만 기록합니다.
+    """
+    score_doc = await scores_collection.find_one_and_update(
+        {**query, "last_event_id": {"$exists": False}, "ledger_seeded": {"$ne": True}},
+        {"$set": {"ledger_seeded": True}},
+        projection={"studentId": 1, "scores": 1}
+    )
+    if not score_doc:
+        return None
+    opening = [
+        {"studentId": score_doc["studentId"], "category": category, "points": score,
+         "source": {"type": "opening_balance"}, "created_at": datetime.now()}
+        for category, score in (score_doc.get("scores") or {}).items()
+    ]
+    if opening:
+        await score_ledger_collection.insert_many(opening)
+    return score_doc
+
+async def seed_score_ledger(batch_size: int = 1000) -> int:
+    """
+    ScoreLedger 도입 전의 점수를 학생·카테고리별 opening balance 이벤트로 기록합니다.
+    서버가 이미 점수를 바꾼 문서는 update_scores가 기록해 두었으므로 건너뜁니다. 재실행해도 안전합니다.
+    """
+    seeded = 0
+    query = {"last_event_id": {"$exists": False}, "ledger_seeded": {"$ne": True}}
+    async for score_doc in scores_collection.find(query, {"_id": 1}, batch_size=batch_size):
+        if await claim_opening_balance({"_id": score_doc["_id"]}):
+            seeded += 1
+    return seeded
+
+
+# 리더보드 =====================================================
+OVERALL_CATEGORY = "overall"
+# 전체 순위용 합계 점수 (update_scores에서 함께 갱신, scores.<category>와 같이 인덱스로 정렬)
+TOTAL_SCORE_EXPR = {"$sum": {"$map": {"input": {"$objectToArray": {"$ifNull": ["$scores", {}]}}, "in": "$$this.v"}}}
+# 여러 워커로 실행하면 프로세스별 메모리 순위가 어긋나므로 0으로 두고 인덱스 조회만 사용
+LEADERBOARD_IN_MEMORY = os.getenv("LEADERBOARD_IN_MEMORY", "1") == "1"
+
+class Leaderboard:
+    """
+    카테고리별(및 전체) 점수 순위를 SortedList로 유지하는 메모리 인덱스.
+    update_scores 때마다 갱신되며 순위 조회는 O(log n), 페이지 조회는 O(log n + limit)입니다.
+    """
+    def __init__(self):
+        self.loaded = False
+        self._ranked: Dict[str, SortedList] = defaultdict(SortedList)  # category → [(-score, studentId)]
+        self._scores: Dict[str, Dict[str, float]] = defaultdict(dict)  # category → {studentId: score}
+
+    def _set_score(self, category: str, student_id: str, score: float):
+        previous = self._scores[category].get(student_id)
+        if previous is not None:
+            self._ranked[category].discard((-previous, student_id))
+        self._scores[category][student_id] = score
+        self._ranked[category].add((-score, student_id))
+
+    def update(self, student_id: str, scores: Dict[str, float]):
+        for category, score in scores.items():
+            self._set_score(category, student_id, score)
+        self._set_score(OVERALL_CATEGORY, student_id, sum(scores.values()))
+
+    def score(self, category: str, student_id: str) -> Optional[float]:
+        return self._scores[category].get(student_id)
+
+    def rank(self, category: str, score: float) -> int:
+        # 더 높은 점수를 가진 학생 수 + 1 (동점은 같은 순위)
+        return self._ranked[category].bisect_left((-score,)) + 1
+
+    def page(self, category: str, offset: int, limit: int) -> List[Tuple[str, float]]:
+        return [(student_id, -negative) for negative, student_id in self._ranked[category].islice(offset, offset + limit)]
+
+    def size(self, category: str) -> int:
+        return len(self._ranked[category])
+
+    async def load(self, collection):
+        self._ranked.clear()
+        self._scores.clear()
+        async for score_doc in collection.find({}, {"studentId": 1, "scores": 1}, batch_size=1000):
+            self.update(score_doc["studentId"], score_doc.get("scores") or {})
+        self.loaded = True
+
+leaderboard = Leaderboard()
+
+def leaderboard_field(category: str) -> str:
+    if category == OVERALL_CATEGORY:
+        return "total_score"
+    if category not in titles:
+        raise HTTPException(status_code=400, detail="Unknown category")
+    return f"scores.{category}"
+
+def get_student_loader() -> BatchLoader:
+    """학번 → Student 문서(이름) 로더 (요청마다 새로 생성)"""
+    return BatchLoader(student_collection, "student_id", {"student_id": 1, "name": 1})
+
+@app.get("/api/leaderboard/{category}")
+async def get_leaderboard(category: str, limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0),
+                          student_loader: BatchLoader = Depends(get_student_loader)):
+    field = leaderboard_field(category)
+    if leaderboard.loaded:
+        entries = leaderboard.page(category, offset, limit)
+        ranks = [leaderboard.rank(category, score) for _, score in entries]
     else:
-        new_scores = {category: max(0, points)}
-        new_title = get_title(category, new_scores[category])
-        new_titles = {category: new_title}
-        new_score = Score(studentId=student_id, scores=new_scores, titles=new_titles)
-        await scores_collection.insert_one(new_score.dict())
+        # 메모리 인덱스가 없으면 (점수, 학번) 복합 인덱스 순서대로 조회 (컬렉션 전체 정렬 없음)
+        cursor = scores_collection.find({field: {"$exists": True}}, {"studentId": 1, field: 1})
+        score_docs = await cursor.sort([(field, -1), ("studentId", 1)]).skip(offset).limit(limit).to_list(None)
+        entries = [(doc["studentId"], doc.get("total_score", 0) if category == OVERALL_CATEGORY else doc["scores"][category]) for doc in score_docs]
+        # 첫 항목의 순위만 세고, 나머지는 정렬된 페이지 안의 위치로 계산 (동점은 앞 순위를 이어받음)
+        ranks = []
+        for index, (_, score) in enumerate(entries):
+            if index == 0:
+                ranks.append(await scores_collection.count_documents({field: {"$gt": score}}) + 1)
+            elif score == entries[index - 1][1]:
+                ranks.append(ranks[-1])
+            else:
+                ranks.append(offset + index + 1)
 
-    return new_scores, new_title
+    students = {student["student_id"]: student for student in await student_loader.load_many([student_id for student_id, _ in entries])}
+    results = []
+    for (student_id, score), rank in zip(entries, ranks):
+        entry = {
+            "rank": rank,
+            "studentId": student_id,
+            "name": students.get(student_id, {}).get("name"),
+            "score": score
+        }
+        if category != OVERALL_CATEGORY:
+            entry["title"] = get_title(category, score)
+        results.append(entry)
+    return results
+
+@app.get("/api/leaderboard/{category}/students/{studentId}")
+async def get_leaderboard_rank(category: str, studentId: str):
+    field = leaderboard_field(category)
+    score = leaderboard.score(category, studentId) if leaderboard.loaded else None
+    if score is not None:
+        return {"studentId": studentId, "score": score, "rank": leaderboard.rank(category, score), "total": leaderboard.size(category)}
+
+    score_doc = await scores_collection.find_one({"studentId": studentId, field: {"$exists": True}}, {field: 1, "total_score": 1})
+    if not score_doc:
+        raise HTTPException(status_code=404, detail="Score not found")
+    score = score_doc.get("total_score", 0) if category == OVERALL_CATEGORY else score_doc["scores"][category]
+    rank = await scores_collection.count_documents({field: {"$gt": score}}) + 1
+    total = await scores_collection.count_documents({field: {"$exists": True}})
+    return {"studentId": studentId, "score": score, "rank": rank, "total": total}
+
+
+# 답변 작성자 칭호는 저장하지 않고 조회 시점에 일괄 조회 (githubId → studentId, studentId → 카테고리별 칭호)
+student_id_cache = TTLCache(maxsize=10000, ttl=600)
+title_cache = TTLCache(maxsize=10000, ttl=60)
+
+async def load_user_titles(user_ids: set) -> Dict[str, Dict[str, str]]:
+    """githubId 목록의 카테고리별 칭호를 User/scores 콜렉션 각각 최대 한 번의 $in 쿼리로 조회합니다."""
+    missing_users = [user_id for user_id in user_ids if user_id not in student_id_cache]
+    if missing_users:
+        found = {}
+        async for user in user_collection.find({"githubId": {"$in": missing_users}}, {"githubId": 1, "studentId": 1}):
+            found[user["githubId"]] = user.get("studentId")
+        for user_id in missing_users:
+            student_id_cache[user_id] = found.get(user_id)
+    student_ids = {user_id: student_id_cache.get(user_id) for user_id in user_ids}
+
+    titles_by_student = {}
+    missing_students = []
+    for student_id in set(student_ids.values()):
+        if student_id in title_cache:
+            titles_by_student[student_id] = title_cache[student_id]
+        elif student_id:
+            missing_students.append(student_id)
+    if missing_students:
+        async for score in scores_collection.find({"studentId": {"$in": missing_students}}, {"studentId": 1, "titles": 1}):
+            titles_by_student[score["studentId"]] = score.get("titles", {})
+        for student_id in missing_students:
+            title_cache[student_id] = titles_by_student.setdefault(student_id, {})
+
+    return {user_id: titles_by_student.get(student_id, {}) for user_id, student_id in student_ids.items()}
+
+def pick_answer_title(user_titles: Dict[str, str], category: Optional[str]) -> str:
+    # 질문 카테고리의 칭호를 우선 사용하고, 없으면 첫 번째 칭호, 그것도 없으면 기본 칭호
+    if category in user_titles:
+        return user_titles[category]
+    return next(iter(user_titles.values()), "Beginner")
+
+async def attach_answer_titles(questions: List[dict]):
+    question_answers = []
+    user_ids = set()
+    for question in questions:
+        answers = list(question.get("generalAnswers") or [])
+        for line_answers in (question.get("codeAnswers") or {}).values():
+            answers.extend(line_answers)
+        user_ids.update(answer["userId"] for answer in answers)
+        question_answers.append((question.get("category"), answers))
+    if not user_ids:
+        return
+
+    titles = await load_user_titles(user_ids)
+    for category, answers in question_answers:
+        for answer in answers:
+            answer["userTitle"] = pick_answer_title(titles.get(answer["userId"], {}), category)
 
 
 
@@ -1530,25 +2995,126 @@ async def save_question(question: Question):
         raise HTTPException(status_code=500, detail="Error saving question")
 
 
-@app.get("/list/questions", response_model=List[QuestionInDB])
-async def list_questions():
+@app.get("/list/questions", response_model=List[QuestionFields], response_model_exclude_unset=True)
+async def list_questions(response: Response, limit: int = Query(1000, ge=1, le=1000), cursor: Optional[str] = Query(None, alias="next"),
+                         fields: Optional[str] = Query(None)):
     try:
-        questions = await questions_collection.find().to_list(1000)
-        return [QuestionInDB(id=str(q["_id"]), **q) for q in questions]
+        projection = parse_fields(fields, QUESTION_FIELDS, QUESTION_LIST_FIELDS)
+        questions = await fetch_page(questions_collection, response, limit, cursor, projection=projection)
+        await attach_answer_titles(questions)
+        return [QuestionFields(id=str(q["_id"]), **q) for q in questions]
+    except HTTPException as e:
+        raise e
     except Exception as e:
         print(f"Error fetching questions: {str(e)}")
         raise HTTPException(status_code=500, detail="Error fetching questions")
 
-@app.get("/questions/{id}", response_model=QuestionInDB)
-async def get_question(id: str):
+@app.get("/questions/{id}", response_model=QuestionFields, response_model_exclude_unset=True)
+async def get_question(id: str, fields: Optional[str] = Query(None)):
     try:
-        question = await questions_collection.find_one({"_id": ObjectId(id)})
+        projection = parse_fields(fields, QUESTION_FIELDS)
+        question = await questions_collection.find_one({"_id": ObjectId(id)}, projection)
         if question is None:
             raise HTTPException(status_code=404, detail="Question not found")
-        return QuestionInDB(id=str(question["_id"]), **question)
+        await attach_answer_titles([question])
+        if projection is None:
+            return QuestionInDB(id=str(question["_id"]), **question).model_dump()
+        return QuestionFields(id=str(question["_id"]), **question)
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail="Error fetching question")
 
+async def toggle_answer_resolved(question_id: ObjectId, array_path: str, answer_id: str) -> Tuple[Optional[dict], Optional[dict], str]:
+    """
+    답변 하나의 resolved 값을 위치 연산자($)로 원자적으로 토글합니다.
+    현재 값을 조건으로 거는 compare-and-set 방식이므로 동시 요청에도 안전합니다.
+    반환값: (질문 문서(category, userId만), 토글 전 답변, 새 resolved 값)
+    """
+    for current, new in (("false", "true"), ("true", "false")):
+        question = await questions_collection.find_one_and_update(
+            {"_id": question_id, array_path: {"$elemMatch": {"id": answer_id, "resolved": current}}},
+            {"$set": {f"{array_path}.$.resolved": new}},
+            projection={"category": 1, "userId": 1, f"{array_path}.$": 1}
+        )
+        if question:
+            answer = question
+            for key in array_path.split("."):
+                answer = answer[key]
+            return question, answer[0], new
+    return None, None, ""
+
+async def resolve_answer(question_id: ObjectId, array_path: str, answer_id: str) -> Tuple[dict, dict, str, str, str]:
+    """
+    답변 resolved 토글과 질문자/답변자 점수 변경을 함께 처리합니다.
+    사용자를 먼저 확인한 뒤 토글하고, 점수 변경이 실패하면 이미 반영한 점수와 토글을 되돌립니다.
+    반환값: (질문 문서, 토글 전 답변, 새 resolved 값, 답변자 새 칭호, 질문자 새 칭호)
+    """
+    question = await questions_collection.find_one(
+        {"_id": question_id, array_path: {"$elemMatch": {"id": answer_id}}},
+        {"userId": 1, f"{array_path}.$": 1}
+    )
+    if question is None:
+        raise HTTPException(status_code=404, detail="Answer not found")
+    answer = question
+    for key in array_path.split("."):
+        answer = answer[key]
+    github_ids = {question["userId"], answer[0]["userId"]}
+    users = {user["githubId"]: user async for user in user_collection.find({"githubId": {"$in": list(github_ids)}}, {"githubId": 1, "studentId": 1})}
+    if not github_ids <= users.keys():
+        raise HTTPException(status_code=404, detail="User not found")
+
+    question, answer, resolved = await toggle_answer_resolved(question_id, array_path, answer_id)
+    if question is None:
+        raise HTTPException(status_code=404, detail="Answer not found")
+
+    category = question["category"]
+    sign = 1 if resolved == 'true' else -1
+    source = {"question_id": str(question_id), "answer_id": answer_id, "resolved": resolved}
+    changes = [
+        (users[answer["userId"]]["studentId"], sign * 1, "answerer"),
+        (users[question["userId"]]["studentId"], sign * 0.5, "asker"),
+    ]
+    titles, applied = [], []
+    try:
+        for student_id, points, role in changes:
+            _, title = await update_scores(student_id, category, points, {**source, "role": role})
+            titles.append(title)
+            applied.append((student_id, points, role))
+    except Exception:
+        # 반영된 점수를 상쇄 이벤트로 되돌리고 resolved 값을 원래대로 복구
+        for student_id, points, role in applied:
+            await update_scores(student_id, category, -points, {**source, "role": role, "reverted": True})
+        await questions_collection.update_one(
+            {"_id": question_id, array_path: {"$elemMatch": {"id": answer_id, "resolved": resolved}}},
+            {"$set": {f"{array_path}.$.resolved": answer["resolved"]}}
+        )
+        raise
+    return question, answer, resolved, titles[0], titles[1]
+
+async def has_resolved_general_answer(question_id: ObjectId, user_id: str) -> bool:
+    question = await questions_collection.find_one(
+        {"_id": question_id, "generalAnswers": {"$elemMatch": {"userId": user_id, "resolved": "true"}}},
+        {"_id": 1}
+    )
+    return question is not None
+
+async def has_resolved_code_answer(question_id: ObjectId, user_id: str) -> bool:
+    # 줄 번호별 답변 배열을 서버에서 평탄화하여 확인 (문서 전체를 가져오지 않음)
+    question = await questions_collection.find_one({
+        "_id": question_id,
+        "$expr": {"$anyElementTrue": [{"$map": {
+            "input": {"$reduce": {
+                "input": {"$objectToArray": {"$ifNull": ["$codeAnswers", {}]}},
+                "initialValue": [],
+                "in": {"$concatArrays": ["$$value", "$$this.v"]}
+            }},
+            "as": "answer",
+            "in": {"$and": [{"$eq": ["$$answer.userId", user_id]}, {"$eq": ["$$answer.resolved", "true"]}]}
+        }}]}
+    }, {"_id": 1})
+    return question is not None
+
 @app.post("/questions/{id}/answers")
 async def save_code_answer(id: str, answer: CodeAnswer):
     try:
@@ -1556,33 +3122,18 @@ async def save_code_answer(id: str, answer: CodeAnswer):
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
-        # 기본 칭호 설정
-        user_title = "Beginner"
-
-        user_scores = await scores_collection.find_one({"studentId": user["studentId"]})
-        if user_scores:
-            for category, title in user_scores["titles"].items():
-                user_title = title
-                break
-
-        answer.userTitle = user_title  # Set the user title for the answer
-
-        question = await questions_collection.find_one({"_id": ObjectId(id)})
-        if question is None:
-            raise HTTPException(status_code=404, detail="Question not found")
-
-        if str(answer.lineNumber) not in question["codeAnswers"]:
-            question["codeAnswers"][str(answer.lineNumber)] = []
-
-        question["codeAnswers"][str(answer.lineNumber)].append(answer.dict())
+        answer.id = str(ObjectId())
 
+        # 해당 줄의 답변 배열에만 $push (다른 답변을 덮어쓰지 않음)
         result = await questions_collection.update_one(
             {"_id": ObjectId(id)},
-            {"$set": {"codeAnswers": question["codeAnswers"]}}
+            {"$push": {f"codeAnswers.{answer.lineNumber}": answer.dict(exclude={"userTitle"})}}
         )
+        if result.matched_count == 0:
+            raise HTTPException(status_code=404, detail="Question not found")
 
         if result.modified_count == 1:
-            return {"message": "Answer added successfully"}
+            return {"message": "Answer added successfully", "id": answer.id}
         else:
             raise HTTPException(status_code=500, detail="Error adding answer")
     except Exception as e:
@@ -1591,15 +3142,12 @@ async def save_code_answer(id: str, answer: CodeAnswer):
 
 @app.get("/users/{user_id}/resolved-answers")
 async def check_user_resolved_answers(user_id: str, questionId: str):
-    question = await questions_collection.find_one({"_id": ObjectId(questionId)})
+    question = await questions_collection.find_one({"_id": ObjectId(questionId)}, {"_id": 1})
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
 
     # 사용자 ID와 resolved 상태를 체크
-    has_resolved_answer = any(
-        any(answer["userId"] == user_id and answer["resolved"] == "true" for answer in answers)
-        for answers in question["codeAnswers"].values()
-    )
+    has_resolved_answer = await has_resolved_code_answer(question["_id"], user_id)
 
     return {"hasResolvedAnswer": has_resolved_answer}
 
@@ -1612,153 +3160,97 @@ async def save_general_answer(id: str, answer: GeneralAnswer):
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
-        # 기본 칭호 설정
-        user_title = "Beginner"
-
-        user_scores = await scores_collection.find_one({"studentId": user["studentId"]})
-        if user_scores:
-            for category, title in user_scores["titles"].items():
-                user_title = title
-                break
+        answer.id = str(ObjectId())
 
-        answer.userTitle = user_title  # Set the user title for the general answer
-
-        question = await questions_collection.find_one({"_id": ObjectId(id)})
-        if question is None:
-            raise HTTPException(status_code=404, detail="Question not found")
-
-        general_answer_dict = answer.dict()
+        # 칭호는 조회 시점에 계산하므로 저장하지 않음
+        general_answer_dict = answer.dict(exclude={"userTitle"})
         general_answer_dict["createdAt"] = datetime.now()
 
-        question["generalAnswers"].append(general_answer_dict)
-
         result = await questions_collection.update_one(
             {"_id": ObjectId(id)},
-            {"$set": {"generalAnswers": question["generalAnswers"]}}
+            {"$push": {"generalAnswers": general_answer_dict}}
         )
+        if result.matched_count == 0:
+            raise HTTPException(status_code=404, detail="Question not found")
 
         if result.modified_count == 1:
-            return {"message": "General answer added successfully"}
+            return {"message": "General answer added successfully", "id": answer.id}
         else:
             raise HTTPException(status_code=500, detail="Error adding general answer")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error adding general answer: {str(e)}")
 
-@app.post("/questions/{id}/general-answers/{answerIndex}/resolve")
-async def toggle_resolve_general_answer(id: str, answerIndex: int):
+@app.post("/questions/{id}/general-answers/{answerId}/resolve")
+async def toggle_resolve_general_answer(id: str, answerId: str):
     try:
-        question = await questions_collection.find_one({"_id": ObjectId(id)})
-        if question is None:
-            raise HTTPException(status_code=404, detail="Question not found")
-
-        if answerIndex < 0 or answerIndex >= len(question["generalAnswers"]):
-            raise HTTPException(status_code=404, detail="Answer not found")
-
-        answer = question["generalAnswers"][answerIndex]
-
-        # Toggle resolved status
-        answer["resolved"] = 'true' if answer["resolved"] == 'false' else 'false'
-
-        category = question["category"]
-        question_user = await user_collection.find_one({"githubId": question["userId"]})
-        answer_user = await user_collection.find_one({"githubId": answer["userId"]})
-        if not question_user or not answer_user:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        points_change = 1 if answer["resolved"] == 'true' else -1
-        question_points_change = 0.5 if answer["resolved"] == 'true' else -0.5
-
-        answer_scores, answer_title = await update_scores(answer_user["studentId"], category, points_change)
-        question_scores, question_title = await update_scores(question_user["studentId"], category, question_points_change)
-
-        # Update answer with new title
-        answer["userTitle"] = answer_title
-
-        result = await questions_collection.update_one(
-            {"_id": ObjectId(id)},
-            {"$set": {"generalAnswers": question["generalAnswers"]}}
-        )
+        question, answer, resolved, answer_title, question_title = await resolve_answer(ObjectId(id), "generalAnswers", answerId)
 
         # Check if the user has any other resolved answers
-        other_resolved_answers = any(
-            ans["userId"] == answer["userId"] and ans["resolved"] == 'true'
-            for ans in question["generalAnswers"]
-        )
+        other_resolved_answers = resolved == 'true' or await has_resolved_general_answer(question["_id"], answer["userId"])
 
-        if result.modified_count == 1:
-            return {
-                "message": "Answer resolve status toggled",
-                "answer_user_new_title": answer_title,
-                "question_user_new_title": question_title,
-                "hasResolvedAnswer": other_resolved_answers
-            }
-        else:
-            raise HTTPException(status_code=500, detail="Error toggling resolve status")
+        return {
+            "message": "Answer resolve status toggled",
+            "answer_user_new_title": answer_title,
+            "question_user_new_title": question_title,
+            "hasResolvedAnswer": other_resolved_answers
+        }
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error toggling resolve status: {str(e)}")
 
 
-@app.post("/questions/{id}/answers/{lineNumber}/{answerIndex}/resolve")
-async def toggle_resolve_code_answer(id: str, lineNumber: int, answerIndex: int):
+@app.post("/questions/{id}/answers/{lineNumber}/{answerId}/resolve")
+async def toggle_resolve_code_answer(id: str, lineNumber: int, answerId: str):
     try:
-        question = await questions_collection.find_one({"_id": ObjectId(id)})
-        if question is None:
-            raise HTTPException(status_code=404, detail="Question not found")
-
-        line_answers = question["codeAnswers"].get(str(lineNumber), [])
-        if answerIndex < 0 or answerIndex >= len(line_answers):
-            raise HTTPException(status_code=404, detail="Answer not found")
-
-        answer = line_answers[answerIndex]
-
-        # Toggle resolved status
-        answer["resolved"] = 'true' if answer["resolved"] == 'false' else 'false'
-
-        category = question["category"]
-        question_user = await user_collection.find_one({"githubId": question["userId"]})
-        answer_user = await user_collection.find_one({"githubId": answer["userId"]})
-        if not question_user or not answer_user:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        points_change = 1 if answer["resolved"] == 'true' else -1
-        question_points_change = 0.5 if answer["resolved"] == 'true' else -0.5
-
-        answer_scores, answer_title = await update_scores(answer_user["studentId"], category, points_change)
-        question_scores, question_title = await update_scores(question_user["studentId"], category, question_points_change)
-
-        # Update answer with new title
-        answer["userTitle"] = answer_title
-
-        # Update all answers by the same user with the new title
-        for line_answers_list in question["codeAnswers"].values():
-            for ans in line_answers_list:
-                if ans["userId"] == answer["userId"]:
-                    ans["userTitle"] = answer_title
-
-        result = await questions_collection.update_one(
-            {"_id": ObjectId(id)},
-            {"$set": {"codeAnswers": question["codeAnswers"]}}
-        )
+        line_path = f"codeAnswers.{lineNumber}"
+        question, answer, resolved, answer_title, question_title = await resolve_answer(ObjectId(id), line_path, answerId)
 
         # Check if the user has any other resolved answers
-        other_resolved_answers = any(
-            any(ans["userId"] == answer["userId"] and ans["resolved"] == 'true' for ans in ans_list)
-            for ans_list in question["codeAnswers"].values()
-        )
+        other_resolved_answers = resolved == 'true' or await has_resolved_code_answer(question["_id"], answer["userId"])
 
-        if result.modified_count == 1:
-            return {
-                "message": "Answer resolve status toggled",
-                "answer_user_new_title": answer_title,
-                "question_user_new_title": question_title,
-                "hasResolvedAnswer": other_resolved_answers
-            }
-        else:
-            raise HTTPException(status_code=500, detail="Error toggling resolve status")
+        return {
+            "message": "Answer resolve status toggled",
+            "answer_user_new_title": answer_title,
+            "question_user_new_title": question_title,
+            "hasResolvedAnswer": other_resolved_answers
+        }
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error toggling resolve status: {str(e)}")
 
 
+async def migrate_answer_ids(batch_size: int = 500) -> int:
+    """
+    id가 없는 기존 답변에 고유 ID를 부여하는 일회성 마이그레이션.
+    이미 id가 있는 답변은 유지하므로 재실행해도 안전합니다.
+    """
+    updated = 0
+    operations = []
+    query = {"$or": [
+        {"generalAnswers": {"$elemMatch": {"id": {"$exists": False}}}},
+        {"codeAnswers": {"$exists": True}}
+    ]}
+    async for question in questions_collection.find(query, {"codeAnswers": 1, "generalAnswers": 1}, batch_size=batch_size):
+        changes = {}
+        general_answers = question.get("generalAnswers") or []
+        if any("id" not in answer for answer in general_answers):
+            changes["generalAnswers"] = [{"id": str(ObjectId()), **answer} if "id" not in answer else answer for answer in general_answers]
+        for line, answers in (question.get("codeAnswers") or {}).items():
+            if any("id" not in answer for answer in answers):
+                changes[f"codeAnswers.{line}"] = [{"id": str(ObjectId()), **answer} if "id" not in answer else answer for answer in answers]
+        if changes:
+            operations.append(UpdateOne({"_id": question["_id"]}, {"$set": changes}))
+            updated += 1
+        if len(operations) >= batch_size:
+            await questions_collection.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        await questions_collection.bulk_write(operations, ordered=False)
+    return updated
+
+
 
 
 class Problem(BaseModel):
@@ -1769,6 +3261,9 @@ class Problem(BaseModel):
     sample_input: str
     sample_output: str
 
+PROBLEM_FIELDS = set(Problem.model_fields)
+PROBLEM_LIST_FIELDS = ("title",)  # 문제 목록 카드에는 제목만 표시
+
 class CodeSubmission(BaseModel):
     problem_id: str
     user_id: str
@@ -1793,79 +3288,293 @@ async def create_problem(problem: Problem):
     return {"id": str(result.inserted_id)}
 
 @app.get("/problems/")
-async def get_problems():
-    problems = await problems_collection.find().to_list(1000)
+async def get_problems(response: Response, limit: int = Query(1000, ge=1, le=1000), cursor: Optional[str] = Query(None, alias="next"),
+                       fields: Optional[str] = Query(None)):
+    projection = parse_fields(fields, PROBLEM_FIELDS, PROBLEM_LIST_FIELDS)
+    problems = await fetch_page(problems_collection, response, limit, cursor, projection=projection)
     for problem in problems:
         problem["_id"] = str(problem["_id"])
     return problems
 
 @app.get("/problems/{problem_id}")
-async def get_problem(problem_id: str):
-    problem = await problems_collection.find_one({"_id": ObjectId(problem_id)})
+async def get_problem(problem_id: str, fields: Optional[str] = Query(None)):
+    projection = parse_fields(fields, PROBLEM_FIELDS)
+    problem = await problems_collection.find_one({"_id": ObjectId(problem_id)}, projection)
     if problem:
         problem["_id"] = str(problem["_id"])
         return problem
     raise HTTPException(status_code=404, detail="Problem not found")
 
-@app.post("/submissions/")
-async def submit_code(submission: CodeSubmission):
-    logger.info(f"Received submission: {submission}")
-    language_id = languages.get(submission.language.lower())
-    if not language_id:
-        raise HTTPException(status_code=400, detail="Language not supported.")
-
-    problem = await problems_collection.find_one({"_id": ObjectId(submission.problem_id)})
-    if not problem:
-        raise HTTPException(status_code=404, detail="Problem not found")
+# 채점 큐 설정: JUDGE_RUNNER=judge0(기본) 또는 local(서버에서 직접 실행, 오프라인/학내 설치용)
+# local은 JUDGE_LOCAL_USER(권한 없는 전용 계정, 서버는 root로 실행)를 지정하거나,
+# 격리 없이 서버 계정으로 실행해도 된다는 뜻으로 JUDGE_LOCAL_UNSAFE=1을 지정해야 시작됨
+JUDGE_RUNNER = os.getenv("JUDGE_RUNNER", "judge0")
+JUDGE_CONCURRENCY = int(os.getenv("JUDGE_CONCURRENCY", "4"))
+JUDGE_POLL_INTERVAL = float(os.getenv("JUDGE_POLL_INTERVAL", "2"))
+JUDGE_LEASE_SECONDS = 120  # 작업을 잡은 워커가 죽으면 이 시간 뒤 다른 워커가 다시 가져감
+JUDGE_JOB_TIMEOUT = 60  # 작업 하나의 실행 제한 시간 (리스보다 짧아야 정상 실행 중인 작업을 다시 가져가지 않음)
+JUDGE_MAX_ATTEMPTS = 3
+JUDGE_TIME_LIMIT = float(os.getenv("JUDGE_TIME_LIMIT", "5"))
+JUDGE_MEMORY_LIMIT_MB = int(os.getenv("JUDGE_MEMORY_LIMIT_MB", "512"))
+JUDGE_OUTPUT_LIMIT = 1024 * 1024
+JUDGE_LOCAL_USER = os.getenv("JUDGE_LOCAL_USER")
+JUDGE_LOCAL_UNSAFE = os.getenv("JUDGE_LOCAL_UNSAFE") == "1"
+JUDGE_LOCAL_NPROC = int(os.getenv("JUDGE_LOCAL_NPROC", "64"))
+CLONE_NEWNET = 0x40000000
+
+# 로컬 채점기 언어별 (소스 파일명, 실행 명령). JUDGE_LOCAL_USER 계정이 실행할 수 있는 인터프리터여야 함
+LOCAL_RUNNERS = {
+    "python": ("main.py", [os.getenv("JUDGE_PYTHON", sys.executable), "-I", "main.py"]),
+    "javascript": ("main.js", ["node", "main.js"]),
+}
 
-    submission_data = {
-        "source_code": submission.code,
-        "language_id": language_id,
-    }
+def judge_status(status_id: int, description: str) -> dict:
+    # Judge0 응답과 같은 형태의 상태
+    return {"id": status_id, "description": description}
 
+async def run_judge0(session: aiohttp.ClientSession, code: str, language: str, stdin: str) -> dict:
     headers = {
         "Content-Type": "application/json",
         "X-RapidAPI-Host": "judge0-ce.p.rapidapi.com",
         "X-RapidAPI-Key": JUDGE0_API_KEY
     }
+    submission_data = {"source_code": code, "language_id": languages[language], "stdin": stdin}
+    async with session.post(JUDGE0_API_URL, json=submission_data, headers=headers) as response:
+        if response.status != 201:
+            raise RuntimeError(f"Error submitting code: {response.status} {response.reason}")
+        token = (await response.json())["token"]
+
+    # 상태 1(In Queue), 2(Processing)이거나 일시적 오류(429/5xx)이면 간격을 늘려 가며 다시 조회
+    # 전체 시간은 JudgeQueue.execute의 JUDGE_JOB_TIMEOUT으로 제한됨
+    delay = 0.5
+    while True:
+        await asyncio.sleep(delay)
+        async with session.get(f"{JUDGE0_API_URL}{token}", headers=headers) as result_response:
+            # 게이트웨이 오류 응답은 JSON이 아닐 수 있으므로 상태 코드를 먼저 확인
+            if result_response.status == 200:
+                result_data = await result_response.json()
+                if result_data.get("status", {}).get("id", 0) > 2:
+                    return result_data
+            elif result_response.status != 429 and result_response.status < 500:
+                raise RuntimeError(f"Error fetching result: {result_response.status} {result_response.reason}")
+        delay = min(delay * 2, 4)
+
+def check_local_runner():
+    # 서버 계정으로 제출 코드를 실행하면 .env 등 서버 파일과 네트워크에 접근할 수 있으므로 명시적으로 선택해야 함
+    if pwd is None or resource is None:
+        raise RuntimeError("JUDGE_RUNNER=local requires a POSIX system.")
+    if JUDGE_LOCAL_USER:
+        pwd.getpwnam(JUDGE_LOCAL_USER)
+        if os.geteuid() != 0:
+            raise RuntimeError("JUDGE_LOCAL_USER requires the server to run as root.")
+    elif not JUDGE_LOCAL_UNSAFE:
+        raise RuntimeError("JUDGE_RUNNER=local needs JUDGE_LOCAL_USER, or JUDGE_LOCAL_UNSAFE=1 to run code as the server user.")
+
+def limit_local_process():
+    # 자식 프로세스에서 exec 직전에 실행: CPU 시간, 메모리, 프로세스 수, 출력 파일 크기 제한
+    resource.setrlimit(resource.RLIMIT_CPU, (int(JUDGE_TIME_LIMIT) + 1, int(JUDGE_TIME_LIMIT) + 1))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (JUDGE_OUTPUT_LIMIT, JUDGE_OUTPUT_LIMIT))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_NPROC, (JUDGE_LOCAL_NPROC, JUDGE_LOCAL_NPROC))
+    if JUDGE_MEMORY_LIMIT_MB:
+        memory = JUDGE_MEMORY_LIMIT_MB * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_DATA, (memory, memory))
+    if JUDGE_LOCAL_USER:
+        # 새 네트워크 네임스페이스(외부 연결 없음)로 분리한 뒤 전용 계정으로 권한을 낮춤
+        if ctypes.CDLL(None, use_errno=True).unshare(CLONE_NEWNET) != 0:
+            os._exit(126)
+        user = pwd.getpwnam(JUDGE_LOCAL_USER)
+        os.setgroups([])
+        os.setgid(user.pw_gid)
+        os.setuid(user.pw_uid)
+
+def kill_process_group(process):
+    # start_new_session으로 만든 프로세스 그룹 전체(포크된 자손 포함)를 종료
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
 
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.post(JUDGE0_API_URL, json=submission_data, headers=headers) as response:
-                if response.status != 201:
-                    logger.error(f"Error submitting code: {response.status} {response.reason}")
-                    raise HTTPException(status_code=500, detail="Error submitting code.")
-                result = await response.json()
-                token = result['token']
-                logger.info(f"Code submitted successfully. Token: {token}")
-
-                result_url = f"{JUDGE0_API_URL}{token}"
-                while True:
-                    async with session.get(result_url, headers=headers) as result_response:
-                        result_data = await result_response.json()
-                        if result_response.status == 200 and result_data.get("status", {}).get("description") != "In Queue":
-                            # 제출된 코드의 출력과 문제의 예상 출력을 비교
-                            is_correct = result_data['stdout'].strip() == problem['sample_output'].strip()
-                            result_data['is_correct'] = is_correct
-
-                            submission_record = {
-                                "problem_id": submission.problem_id,
-                                "user_id": submission.user_id,
-                                "code": submission.code,
-                                "language": submission.language,
-                                "result": result_data,
-                            }
-                            await submissions_collection.insert_one(submission_record)
-                            logger.info(f"Submission result: {result_data}")
-                            return result_data
-                        await asyncio.sleep(1)
-        except Exception as e:
-            logger.error(f"Exception occurred: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error executing code: {e}")
+async def run_local(code: str, language: str, stdin: str) -> dict:
+    """
+    빈 임시 디렉터리에서 최소 환경 변수와 자원 제한으로 코드를 실행하고 Judge0와 같은 형태의 결과를 반환합니다.
+    JUDGE_LOCAL_USER가 없으면 서버 계정 권한으로 실행되므로 격리된 환경이 아닙니다 (check_local_runner 참고).
+    """
+    filename, command = LOCAL_RUNNERS[language]
+    with tempfile.TemporaryDirectory(prefix="judge-") as workdir:
+        if JUDGE_LOCAL_USER:
+            user = pwd.getpwnam(JUDGE_LOCAL_USER)
+            os.chown(workdir, user.pw_uid, user.pw_gid)
+        with open(os.path.join(workdir, filename), "w", encoding="utf-8") as source:
+            source.write(code)
+        stdout_path, stderr_path = os.path.join(workdir, "stdout"), os.path.join(workdir, "stderr")
+        with open(stdout_path, "wb") as stdout, open(stderr_path, "wb") as stderr:
+            started = time.perf_counter()
+            process = await asyncio.create_subprocess_exec(
+                *command, cwd=workdir, env={"PATH": os.environ.get("PATH", "")},
+                stdin=asyncio.subprocess.PIPE, stdout=stdout, stderr=stderr,
+                preexec_fn=limit_local_process, start_new_session=True
+            )
+            try:
+                await asyncio.wait_for(process.communicate((stdin or "").encode()), timeout=JUDGE_TIME_LIMIT)
+                timed_out = False
+            except asyncio.TimeoutError:
+                timed_out = True
+            finally:
+                # 시간 초과, 취소, 정상 종료 모두 남아 있는 자손 프로세스까지 정리
+                kill_process_group(process)
+                await process.wait()
+            elapsed = time.perf_counter() - started
+
+        with open(stdout_path, "rb") as stdout, open(stderr_path, "rb") as stderr:
+            output = stdout.read(JUDGE_OUTPUT_LIMIT).decode(errors="replace")
+            errors = stderr.read(JUDGE_OUTPUT_LIMIT).decode(errors="replace")
+
+    if timed_out:
+        status = judge_status(5, "Time Limit Exceeded")
+    elif process.returncode != 0:
+        status = judge_status(11, "Runtime Error (NZEC)")
+    else:
+        status = judge_status(3, "Accepted")
+    return {
+        "stdout": output,
+        "stderr": errors or None,
+        "compile_output": None,
+        "message": f"Exited with code {process.returncode}" if process.returncode and not timed_out else None,
+        "time": f"{elapsed:.3f}",
+        "memory": None,
+        "status": status,
+    }
+
+class JudgeQueue:
+    """
+    submissions 콜렉션을 영속 큐로 사용하는 채점 워커 풀.
+    제출은 status="queued" 문서로 저장되고, concurrency개의 워커가 find_one_and_update로 작업을 하나씩 점유(lease)해 실행합니다.
+    같은 프로세스의 제출은 이벤트로 바로 깨우고, 다른 프로세스의 제출은 poll_interval마다 확인합니다.
+    """
+    def __init__(self, collection, runner: str = "judge0", concurrency: int = 4, poll_interval: float = 2.0):
+        self.collection = collection
+        self.runner = runner
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def notify(self):
+        self._wakeup.set()
+
+    async def claim(self) -> Optional[dict]:
+        # lease_id로 점유를 구분하여, 리스가 만료된 뒤 끝난 이전 실행의 결과가 새 실행을 덮어쓰지 않게 함
+        now = datetime.now()
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued"},
+                {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$lt": JUDGE_MAX_ATTEMPTS}}
+            ]},
+            {"$set": {"status": "running", "started_at": now, "lease_id": ObjectId(),
+                      "lease_until": now + timedelta(seconds=JUDGE_LEASE_SECONDS)},
+             "$inc": {"attempts": 1}},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def expire(self):
+        # 리스가 만료되었고 재시도 횟수도 소진한 작업은 오류로 종료
+        await self.collection.update_many(
+            {"status": "running", "lease_until": {"$lt": datetime.now()}, "attempts": {"$gte": JUDGE_MAX_ATTEMPTS}},
+            {"$set": {"status": "error", "error": "Judging did not finish.", "finished_at": datetime.now()},
+             "$unset": {"lease_until": "", "lease_id": ""}}
+        )
+
+    async def execute(self, job: dict) -> dict:
+        problem = await problems_collection.find_one({"_id": ObjectId(job["problem_id"])}, {"sample_input": 1, "sample_output": 1})
+        if not problem:
+            raise RuntimeError("Problem not found")
+        if self.runner == "local":
+            result_data = await run_local(job["code"], job["language"], problem.get("sample_input", ""))
+        else:
+            result_data = await run_judge0(self._session, job["code"], job["language"], problem.get("sample_input", ""))
+        # 제출된 코드의 출력과 문제의 예상 출력을 비교
+        result_data["is_correct"] = (result_data.get("stdout") or "").strip() == problem.get("sample_output", "").strip()
+        return result_data
+
+    async def _work(self):
+        while True:
+            job = await self.claim()
+            if not job:
+                await self.expire()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            owned = {"_id": job["_id"], "lease_id": job["lease_id"]}
+            try:
+                result_data = await asyncio.wait_for(self.execute(job), timeout=JUDGE_JOB_TIMEOUT)
+                update = {"status": "done", "result": result_data}
+            except asyncio.CancelledError:
+                # 종료 중: 다른 워커가 바로 가져갈 수 있도록 대기 상태로 되돌림
+                await self.collection.update_one(owned, {"$set": {"status": "queued"}, "$inc": {"attempts": -1}})
+                raise
+            except asyncio.TimeoutError:
+                logger.error("Judge job %s timed out after %ss", job["_id"], JUDGE_JOB_TIMEOUT)
+                update = {"status": "error", "error": "Judging timed out."}
+            except Exception as e:
+                logger.error("Judge job %s failed: %s", job["_id"], str(e))
+                update = {"status": "error", "error": str(e)}
+            await self.collection.update_one(
+                owned,
+                {"$set": {**update, "finished_at": datetime.now()}, "$unset": {"lease_until": "", "lease_id": ""}}
+            )
+
+    def start(self):
+        if self.runner == "local":
+            check_local_runner()
+        else:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=JUDGE_JOB_TIMEOUT))
+        loop = asyncio.get_running_loop()
+        self._workers = [loop.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+judge_queue = JudgeQueue(submissions_collection, JUDGE_RUNNER, JUDGE_CONCURRENCY, JUDGE_POLL_INTERVAL)
+
+@app.post("/submissions/", status_code=202)
+async def submit_code(submission: CodeSubmission):
+    language = submission.language.lower()
+    if language not in (LOCAL_RUNNERS if JUDGE_RUNNER == "local" else languages):
+        raise HTTPException(status_code=400, detail="Language not supported.")
+
+    problem = await problems_collection.find_one({"_id": ObjectId(submission.problem_id)}, {"_id": 1})
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+
+    # 채점은 워커가 처리하고, 클라이언트는 GET /submissions/{id}로 결과를 조회
+    submission_record = {
+        "problem_id": submission.problem_id,
+        "user_id": submission.user_id,
+        "code": submission.code,
+        "language": language,
+        "status": "queued",
+        "attempts": 0,
+        "created_at": datetime.now(),
+    }
+    result = await submissions_collection.insert_one(submission_record)
+    judge_queue.notify()
+    return {"id": str(result.inserted_id), "status": "queued"}
 
 @app.get("/submissions/{submission_id}")
 async def get_submission(submission_id: str):
-    submission = await submissions_collection.find_one({"_id": ObjectId(submission_id)})
+    submission = await submissions_collection.find_one({"_id": ObjectId(submission_id)}, {"lease_until": 0, "lease_id": 0})
     if submission:
         submission["_id"] = str(submission["_id"])
         return submission
@@ -0,0 +1,96 @@
+"""
+데이터 마이그레이션 및 관리 작업 실행 스크립트.
+
+    python migrations.py project-comments [--batch-size 500]
+    python migrations.py answer-ids [--batch-size 500]
+    python migrations.py score-totals
+    python migrations.py seed-score-ledger [--batch-size 1000]
+    python migrations.py rebuild-scores [--batch-size 1000]   # ScoreLedger 재생으로 점수/칭호 재계산
+    python migrations.py evaluation-totals                     # 평가 누적 합계 채우기/복구
+    python migrations.py evaluation-assignments [--batch-size 500]
+    python migrations.py course-teams                          # 팀별 문서 분리 및 team_count 설정
+    python migrations.py reservation-slots                     # 기존 예약으로 슬롯 카운터 채우기
+"""
+import argparse
+import asyncio
+import time
+
+import main
+
+
+async def project_comments(batch_size: int):
+    migrated = await main.migrate_embedded_comments(batch_size)
+    await main.comment_collection.create_index([("project_id", 1), ("timestamp", 1), ("_id", 1)])
+    print(f"{migrated} embedded comments migrated to the Comment collection.")
+
+
+async def answer_ids(batch_size: int):
+    updated = await main.migrate_answer_ids(batch_size)
+    print(f"{updated} questions updated with answer ids.")
+
+
+async def score_totals(batch_size: int):
+    # 리더보드 전체 순위용 total_score 필드 채우기
+    result = await main.scores_collection.update_many({}, [{"$set": {"total_score": main.TOTAL_SCORE_EXPR}}])
+    print(f"{result.modified_count} score documents updated with total_score.")
+
+
+async def seed_score_ledger(batch_size: int):
+    seeded = await main.seed_score_ledger(batch_size)
+    print(f"{seeded} score documents seeded into the ScoreLedger.")
+
+
+async def rebuild_scores(batch_size: int):
+    started = time.perf_counter()
+    students, events = await main.rebuild_scores_from_ledger(batch_size)
+    print(f"{students} students rebuilt from {events} ledger events in {time.perf_counter() - started:.1f}s.")
+
+
+async def evaluation_totals(batch_size: int):
+    for course_code in await main.evaluation_result_collection.distinct("course_code"):
+        drift = await main.check_evaluation_totals(course_code, repair=True)
+        print(f"{course_code}: {len(drift)} teams repaired.")
+
+
+async def evaluation_assignments(batch_size: int):
+    # 고유 인덱스는 구 형식 문서를 분리한 뒤에 만들어야 함
+    migrated = await main.migrate_evaluation_assignments(batch_size)
+    await main.evaluation_assignment_collection.create_index([("course_code", 1), ("studentId", 1)], unique=True)
+    print(f"{migrated} student assignments split into per-student documents.")
+
+
+async def course_teams(batch_size: int):
+    migrated = await main.migrate_course_teams()
+    await main.course_team_collection.create_index([("course_code", 1), ("team_name", 1)], unique=True)
+    print(f"{migrated} teams split into per-team documents.")
+
+
+async def reservation_slots(batch_size: int):
+    await main.reservation_slot_collection.create_index([("userId", 1), ("date", 1), ("time", 1)], unique=True)
+    slots = await main.migrate_reservation_slots()
+    print(f"{slots} reservation slot counters set from existing reservations.")
+
+
+MIGRATIONS = {
+    "project-comments": project_comments,
+    "answer-ids": answer_ids,
+    "score-totals": score_totals,
+    "seed-score-ledger": seed_score_ledger,
+    "rebuild-scores": rebuild_scores,
+    "evaluation-totals": evaluation_totals,
+    "evaluation-assignments": evaluation_assignments,
+    "course-teams": course_teams,
+    "reservation-slots": reservation_slots,
+}
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("migration", choices=sorted(MIGRATIONS))
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(MIGRATIONS[args.migration](args.batch_size))
+
+
+if __name__ == "__main__":
+    run()
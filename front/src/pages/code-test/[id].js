@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { useRouter } from 'next/router'
 import { Box, Button, Container, Grid, MenuItem, Select, Typography } from '@mui/material'
 import Editor from '@monaco-editor/react'
@@ -11,6 +11,10 @@ export default function SolveProblem() {
   const [language, setLanguage] = useState('python')
   const [result, setResult] = useState(null)
   const [error, setError] = useState('')
+  const pollTimer = useRef(null)
+
+  // 페이지를 떠나면 결과 조회를 중단
+  useEffect(() => () => clearTimeout(pollTimer.current), [])
 
   useEffect(() => {
     const fetchProblem = async () => {
@@ -44,12 +48,42 @@ export default function SolveProblem() {
       })
     })
     const data = await response.json()
-    if (data.error) {
-      setError(data.error)
-    } else {
-      setResult(data)
-      setError('')
+    if (!response.ok) {
+      setError(data.detail || 'Submission failed')
+
+      return
+    }
+    setResult(null)
+    setError('')
+    clearTimeout(pollTimer.current)
+
+    // 채점은 서버 큐에서 비동기로 처리되므로 완료될 때까지 결과를 조회 (최대 120번, 약 2분)
+    let attempts = 0
+    const poll = async () => {
+      attempts += 1
+      try {
+        const submission = await (await fetch(`http://localhost:8000/submissions/${data.id}`)).json()
+        if (submission.status === 'done') {
+          setResult(submission.result)
+
+          return
+        }
+        if (submission.status === 'error') {
+          setError(submission.error)
+
+          return
+        }
+      } catch (err) {
+        console.error('Error fetching submission:', err)
+      }
+      if (attempts >= 120) {
+        setError('Judging is taking too long. Please try again later.')
+
+        return
+      }
+      pollTimer.current = setTimeout(poll, 1000)
     }
+    poll()
   }
 
   const renderProblemDetail = (title, content) => (
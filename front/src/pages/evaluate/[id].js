@@ -129,7 +129,12 @@ function ProjectDetails() {
         .then(data => {
           console.log('Fetched project data:', data)
           setProject(data)
-          setComments(data.comments || [])
+
+          return fetch(`http://localhost:8000/api/projects/${id}/comments`)
+        })
+        .then(response => response.json())
+        .then(comments => {
+          setComments(comments || [])
           setIsLoading(false)
         })
         .catch(error => {
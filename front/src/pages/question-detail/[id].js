@@ -147,9 +147,9 @@ export default function QuestionDetailPage() {
     }
   };
 
-  const handleResolveToggle = async (lineNumber, answerIndex) => {
+  const handleResolveToggle = async (lineNumber, answerId) => {
     try {
-      const response = await fetch(`http://127.0.0.1:8000/questions/${id}/answers/${lineNumber}/${answerIndex}/resolve`, {
+      const response = await fetch(`http://127.0.0.1:8000/questions/${id}/answers/${lineNumber}/${answerId}/resolve`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json'
@@ -171,9 +171,9 @@ export default function QuestionDetailPage() {
     }
   };
 
-  const handleResolveGeneralAnswerToggle = async (answerIndex) => {
+  const handleResolveGeneralAnswerToggle = async (answerId) => {
     try {
-      const response = await fetch(`http://127.0.0.1:8000/questions/${id}/general-answers/${answerIndex}/resolve`, {
+      const response = await fetch(`http://127.0.0.1:8000/questions/${id}/general-answers/${answerId}/resolve`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json'
@@ -234,7 +234,7 @@ export default function QuestionDetailPage() {
                           <p>{answer.text}</p>
                           {questionDetails.userId === userId && answer.userId !== userId && (
                             <button
-                              onClick={() => handleResolveToggle(index, idx)}
+                              onClick={() => handleResolveToggle(index, answer.id)}
                               disabled={answer.resolved === 'false' && hasResolvedAnswer}
                             >
                               {answer.resolved === 'true' ? 'Unresolve' : 'Resolve'}
@@ -279,7 +279,7 @@ export default function QuestionDetailPage() {
                 <p>{answer.text}</p>
                 {questionDetails.userId === userId && answer.userId !== userId && (
                   <button
-                    onClick={() => handleResolveGeneralAnswerToggle(index)}
+                    onClick={() => handleResolveGeneralAnswerToggle(answer.id)}
                     disabled={answer.resolved === 'false' && hasResolvedAnswer}
                   >
                     {answer.resolved === 'true' ? 'Unresolve' : 'Resolve'}
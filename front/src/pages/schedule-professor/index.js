@@ -57,8 +57,17 @@ const AvailabilitySettings = () => {
 
   const fetchReservations = async (email) => {
     try {
-      const response = await axios.get('http://localhost:8000/reservations/', { params: { email } });
-      setReservations(response.data);
+      // 예약 목록은 페이지 단위로 내려오므로 X-Next-Cursor가 없을 때까지 이어서 요청
+      const all = [];
+      let cursor = null;
+      do {
+        const response = await axios.get('http://localhost:8000/reservations/', {
+          params: cursor ? { email, next: cursor } : { email }
+        });
+        all.push(...response.data);
+        cursor = response.headers['x-next-cursor'];
+      } while (cursor);
+      setReservations(all);
     } catch (error) {
       console.error('Error fetching reservations:', error);
       alert('Error fetching reservations: ' + (error.response?.data?.detail || 'Unknown error'));
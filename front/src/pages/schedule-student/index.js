@@ -3,16 +3,14 @@ import axios from 'axios';
 import { Container, TextField, MenuItem, Button, Typography, Box, Tab, Tabs, Paper } from '@mui/material';
 import { auth } from '../../../lib/firebase'; // Import Firebase authentication
 import { onAuthStateChanged } from 'firebase/auth'; // Import onAuthStateChanged
-import { setHours, setMinutes, format, isBefore, getDay } from 'date-fns';
+import { getDay } from 'date-fns';
 
 const daysOfWeek = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'];
 
 const ReservationPage = () => {
   const [professors, setProfessors] = useState([]);
   const [selectedProfessor, setSelectedProfessor] = useState(null);
-  const [weeklySchedule, setWeeklySchedule] = useState({});
-  const [unavailableTimes, setUnavailableTimes] = useState([]);
-  const [reservations, setReservations] = useState([]);
+  const [slots, setSlots] = useState([]); // 선택한 날짜가 속한 주의 슬롯별 잔여 인원
   const [studentName, setStudentName] = useState('');
   const [selectedDate, setSelectedDate] = useState('');
   const [selectedTime, setSelectedTime] = useState('');
@@ -48,16 +46,13 @@ const ReservationPage = () => {
   }, []);
 
   useEffect(() => {
-    if (selectedProfessor) {
+    if (selectedProfessor && selectedDate) {
       const fetchData = async () => {
         try {
-          const availabilityResponse = await axios.get('http://localhost:8000/availability/user', { params: { userId: selectedProfessor.professor_id } });
-          setWeeklySchedule(availabilityResponse.data.weeklySchedule);
-          setUnavailableTimes(availabilityResponse.data.unavailableTimes);
-
-          const reservationsResponse = await axios.get('http://localhost:8000/reservations/');
-          setReservations(reservationsResponse.data);
+          const slotsResponse = await axios.get(`http://localhost:8000/availability/${selectedProfessor.professor_id}/slots`, { params: { week: selectedDate } });
+          setSlots(slotsResponse.data);
         } catch (error) {
+          setSlots([]);
           console.error('Error fetching data:', error);
           alert('Error fetching data: ' + (error.response?.data?.detail || 'Unknown error'));
         }
@@ -65,7 +60,7 @@ const ReservationPage = () => {
 
       fetchData();
     }
-  }, [selectedProfessor]);
+  }, [selectedProfessor, selectedDate]);
 
   useEffect(() => {
     if (userId) {
@@ -110,10 +105,6 @@ return;
       setSelectedDate('');
       setSelectedTime('');
 
-      // Fetch the updated reservations after making a new reservation
-      const reservationsResponse = await axios.get('http://localhost:8000/reservations/');
-      setReservations(reservationsResponse.data);
-
       // Fetch the updated user reservations
       const userReservationsResponse = await axios.get(`http://localhost:8000/reservations/user?user_id=${userId}`);
       setUserReservations(userReservationsResponse.data);
@@ -123,30 +114,10 @@ return;
     }
   };
 
-  const generateTimeSlots = (startTime, endTime, interval, day) => {
-    let current = setHours(setMinutes(new Date(), parseInt(startTime.split(':')[1])), parseInt(startTime.split(':')[0]));
-    const end = setHours(setMinutes(new Date(), parseInt(endTime.split(':')[1])), parseInt(endTime.split(':')[0]));
-    const slots = [];
-    while (isBefore(current, end)) {
-      const timeSlot = format(current, 'HH:mm');
-      const isUnavailable = unavailableTimes.some(slot => slot.day === day && slot.time === timeSlot);
-      const isFullyBooked = reservations.filter(reservation => reservation.day === day && reservation.time === timeSlot).length >= (weeklySchedule[day]?.maxCapacity || 1);
-      if (!isUnavailable && !isFullyBooked) {
-        slots.push(timeSlot);
-      }
-      current = setMinutes(current, current.getMinutes() + interval);
-    }
-
-    return slots;
-  };
-
   const getAvailableTimeSlots = () => {
     if (!selectedDate) return [];
-    const selectedDay = daysOfWeek[getDay(new Date(selectedDate))];
 
-    return weeklySchedule[selectedDay]?.start && weeklySchedule[selectedDay]?.end
-      ? generateTimeSlots(weeklySchedule[selectedDay].start, weeklySchedule[selectedDay].end, weeklySchedule[selectedDay].interval, selectedDay)
-      : [];
+    return slots.filter(slot => slot.date === selectedDate && slot.remaining > 0).map(slot => slot.time);
   };
 
   return (